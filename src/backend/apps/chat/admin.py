@@ -6,5 +6,5 @@ from .models import Message
 class MessageAdmin(admin.ModelAdmin):
     list_display = ['id', 'conversation_id', 'role', 'created_at']
     list_filter = ['role', 'created_at']
-    search_fields = ['content', 'conversation_id']
+    search_fields = ['content', '=conversation__id']
     ordering = ['-created_at']
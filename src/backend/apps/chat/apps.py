@@ -1,6 +1,11 @@
+import atexit
 from django.apps import AppConfig
 
 
 class ChatConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'apps.chat'
\ No newline at end of file
+    name = 'apps.chat'
+
+    def ready(self):
+        from .llm import close_llm_client
+        atexit.register(close_llm_client)
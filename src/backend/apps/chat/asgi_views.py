@@ -2,16 +2,69 @@
 Native ASGI view for真正的无缓冲流式传输
 Bypasses Django's StreamingHttpResponse buffering
 """
-import json
+import asyncio
+import io
 import logging
-import os
-import requests
+import httpx
+import orjson
 from django.conf import settings as django_settings
+from django.http import HttpResponse
 from django.views.decorators.csrf import csrf_exempt
+from apps.settings.cache import aget_cached_settings
 from apps.settings.models import UserSettings
+from .llm import llm_client, aget_chat_target, to_api_messages, build_endpoint
+from .capabilities import build_probe_body, classify_probe
+from .models import Message
+from .sse import iter_sse_data, extract_content_bytes
+from .writer import enqueue_message
 
 logger = logging.getLogger(__name__)
 
+# Token deltas are usually a few bytes each; coalesce them into fewer ASGI
+# body messages, flushing once this many bytes are pending or this many
+# seconds have passed since the last flush
+FLUSH_BYTES = 64
+FLUSH_INTERVAL = 0.015
+
+# test_capabilities_batch: models accepted per request, and how many of
+# their probes are sent to the provider at once
+CAPABILITY_BATCH_MAX_MODELS = 20
+CAPABILITY_PROBE_CONCURRENCY = 5
+
+
+class _BodyWriter:
+    """
+    Buffers small response body chunks and sends them as one ASGI message
+    """
+    def __init__(self, send):
+        self._send = send
+        self._pending = bytearray()
+        self._loop = asyncio.get_running_loop()
+        self._last_flush = self._loop.time()
+
+    def write(self, data):
+        self._pending += data
+
+    def timeout(self):
+        """Seconds until pending data is due, or None if nothing is pending"""
+        if not self._pending:
+            return None
+        return max(0.0, FLUSH_INTERVAL - (self._loop.time() - self._last_flush))
+
+    async def maybe_flush(self):
+        if len(self._pending) >= FLUSH_BYTES or self.timeout() == 0:
+            await self.flush()
+
+    async def flush(self, more_body=True):
+        if self._pending or not more_body:
+            await self._send({
+                'type': 'http.response.body',
+                'body': bytes(self._pending),
+                'more_body': more_body,
+            })
+            self._pending.clear()
+        self._last_flush = self._loop.time()
+
 
 @csrf_exempt
 async def chat_stream_asgi(scope, receive, send):
@@ -43,11 +96,15 @@ async def chat_stream_asgi(scope, receive, send):
 
     # Parse JSON body
     try:
-        data = json.loads(body.decode('utf-8'))
+        data = orjson.loads(body)
         messages = data.get('messages', [])
         options = data.get('options', {})
         model = options.get('model', 'gpt-4')
         user_id = data.get('user_id', 'default_user')
+        # Optional: persist the assistant reply to this conversation
+        conversation_id = data.get('conversation_id')
+        if not isinstance(conversation_id, int):
+            conversation_id = None
     except Exception as e:
         await send({
             'type': 'http.response.start',
@@ -60,70 +117,30 @@ async def chat_stream_asgi(scope, receive, send):
         })
         return
 
-    # Get user settings
+    # Get user settings; without an API key there is nothing to stream
     try:
-        user_settings = await UserSettings.objects.aget(user_id=user_id)
+        user_settings, target = await aget_chat_target(user_id)
     except UserSettings.DoesNotExist:
-        await send({
-            'type': 'http.response.start',
-            'status': 200,
-            'headers': [
-                [b'content-type', b'text/plain; charset=utf-8'],
-                [b'cache-control', b'no-cache'],
-                [b'x-accel-buffering', b'no'],
-            ],
-        })
-        await send({
-            'type': 'http.response.body',
-            'body': b'[ERROR]: API key not configured',
-        })
-        return
+        user_settings = None
 
-    if not user_settings.api_key:
+    if user_settings is None or not user_settings.api_key:
         await send({
             'type': 'http.response.start',
-            'status': 200,
-            'headers': [
-                [b'content-type', b'text/plain; charset=utf-8'],
-                [b'cache-control', b'no-cache'],
-                [b'x-accel-buffering', b'no'],
-            ],
+            'status': 401,
+            'headers': [[b'content-type', b'application/json']],
         })
         await send({
             'type': 'http.response.body',
-            'body': b'[ERROR]: API key not configured',
+            'body': orjson.dumps({'error': 'api_key_missing'}),
         })
         return
 
-    # Prepare API request
-    base_url = user_settings.base_url or os.getenv('OPENAI_API_BASE', 'https://api.openai.com/v1')
-    base_url = base_url.rstrip('/')
-    if not base_url.endswith('/v1'):
-        base_url = f"{base_url}/v1"
-
-    headers = {
-        'Authorization': f'Bearer {user_settings.api_key}',
-        'Content-Type': 'application/json'
-    }
-
-    if 'openrouter.ai' in base_url.lower():
-        headers['HTTP-Referer'] = os.getenv('OPENROUTER_REFERER', 'http://localhost:20001')
-        headers['X-Title'] = os.getenv('OPENROUTER_APP_NAME', 'Mini Chatbox')
-
-    api_messages = []
-    for msg in messages:
-        api_messages.append({
-            'role': msg.get('role', 'user'),
-            'content': msg.get('content', '')
-        })
+    api_messages = to_api_messages(messages)
 
     payload = {
+        **target.payload_template,
         'model': model,
-        'messages': api_messages,
-        'stream': True,
-        'temperature': user_settings.temperature,
-        'max_tokens': user_settings.max_tokens,
-        'top_p': user_settings.top_p
+        'messages': api_messages
     }
 
     # Start HTTP response
@@ -140,16 +157,15 @@ async def chat_stream_asgi(scope, receive, send):
 
     # Stream response
     try:
-        with requests.post(
-            f"{base_url}/chat/completions",
-            headers=headers,
-            json=payload,
-            stream=True,
-            timeout=60
+        async with llm_client.stream(
+            'POST',
+            target.url,
+            headers=target.headers,
+            content=orjson.dumps(payload),
         ) as api_response:
 
             if api_response.status_code != 200:
-                error_text = api_response.text
+                error_text = (await api_response.aread()).decode('utf-8', errors='replace')
                 logger.error(f"LLM API error: {api_response.status_code} - {error_text}")
                 await send({
                     'type': 'http.response.body',
@@ -157,63 +173,83 @@ async def chat_stream_asgi(scope, receive, send):
                 })
                 return
 
-            buffer = b''
-            for byte_chunk in api_response.raw.stream(amt=1, decode_content=True):
-                if not byte_chunk:
-                    continue
+            buffer = bytearray()
+            writer = _BodyWriter(send)
+            reply = io.BytesIO()
 
-                buffer += byte_chunk
+            def save_reply():
+                # Hand the full reply to the batched writer, off the response path
+                if conversation_id is not None and reply.tell():
+                    enqueue_message(Message(
+                        conversation_id=conversation_id,
+                        role='assistant',
+                        content=reply.getvalue().decode('utf-8')
+                    ))
 
-                while b'\n' in buffer:
-                    line_bytes, buffer = buffer.split(b'\n', 1)
-                    if not line_bytes:
+            chunks = api_response.aiter_bytes()
+            read = None
+            try:
+                while True:
+                    # Keep one upstream read in flight; if it doesn't complete
+                    # before buffered tokens are due, flush them without
+                    # cancelling the read
+                    if read is None:
+                        read = asyncio.ensure_future(anext(chunks))
+                    done, _ = await asyncio.wait((read,), timeout=writer.timeout())
+                    if not done:
+                        await writer.flush()
                         continue
 
+                    completed, read = read, None
                     try:
-                        line_text = line_bytes.decode('utf-8').strip()
-                    except UnicodeDecodeError:
-                        continue
+                        byte_chunk = completed.result()
+                    except StopAsyncIteration:
+                        break
 
-                    if not line_text or line_text.startswith(':'):
-                        continue
+                    buffer += byte_chunk
 
-                    if line_text.startswith('data: '):
-                        line_text = line_text[6:]
+                    for line_bytes in iter_sse_data(buffer):
+                        if line_bytes == b'[DONE]':
+                            save_reply()
+                            await writer.flush(more_body=False)
+                            return
 
-                    if line_text.strip() == '[DONE]':
-                        await send({
-                            'type': 'http.response.body',
-                            'body': b'',
-                            'more_body': False,
-                        })
-                        return
+                        # Plain content deltas are forwarded as-is
+                        content = extract_content_bytes(line_bytes)
+                        if content is not None:
+                            writer.write(content)
+                            reply.write(content)
+                            continue
 
-                    try:
-                        chunk_data = json.loads(line_text)
-                        choices = chunk_data.get('choices', [])
-                        if choices:
-                            delta = choices[0].get('delta', {})
-                            content = delta.get('content', '')
-                            finish_reason = choices[0].get('finish_reason')
-
-                            if content:
-                                # Send immediately without buffering
-                                await send({
-                                    'type': 'http.response.body',
-                                    'body': content.encode('utf-8'),
-                                    'more_body': True,
-                                })
-
-                            if finish_reason:
-                                await send({
-                                    'type': 'http.response.body',
-                                    'body': b'',
-                                    'more_body': False,
-                                })
-                                return
-
-                    except json.JSONDecodeError:
-                        continue
+                        try:
+                            chunk_data = orjson.loads(line_bytes)
+                            choices = chunk_data.get('choices', [])
+                            if choices:
+                                delta = choices[0].get('delta', {})
+                                content = delta.get('content', '')
+                                finish_reason = choices[0].get('finish_reason')
+
+                                if content:
+                                    content = content.encode('utf-8')
+                                    writer.write(content)
+                                    reply.write(content)
+
+                                if finish_reason:
+                                    save_reply()
+                                    await writer.flush(more_body=False)
+                                    return
+
+                        except ValueError:
+                            continue
+
+                    await writer.maybe_flush()
+            finally:
+                if read is not None:
+                    read.cancel()
+
+            # Upstream closed without [DONE] or finish_reason
+            save_reply()
+            await writer.flush(more_body=False)
 
     except Exception as e:
         logger.error(f"Error streaming response: {str(e)}")
@@ -222,3 +258,69 @@ async def chat_stream_asgi(scope, receive, send):
             'body': f"[ERROR]: {str(e)}".encode(),
             'more_body': False,
         })
+
+
+def _json_response(data, status=200):
+    return HttpResponse(orjson.dumps(data), status=status, content_type='application/json')
+
+
+async def _probe_capabilities(url, headers, model):
+    try:
+        response = await llm_client.post(url, headers=headers, content=build_probe_body(model), timeout=30)
+        return classify_probe(model, response.status_code, response.content)
+
+    except httpx.TimeoutException:
+        logger.error(f"Timeout testing capabilities for {model}")
+        return {
+            'supportsFunctionCalling': None,
+            'model': model,
+            'error': 'Request timeout'
+        }
+
+    except Exception as e:
+        logger.error(f"Error testing capabilities for {model}: {str(e)}")
+        return {
+            'supportsFunctionCalling': None,
+            'model': model,
+            'error': str(e)
+        }
+
+
+@csrf_exempt
+async def test_capabilities_batch(request):
+    """
+    Test function calling support for several models concurrently
+    POST /api/chat/test-capabilities-batch/ {"models": [...], "user_id": ...}
+    """
+    if request.method != 'POST':
+        return _json_response({'error': 'Method not allowed'}, status=405)
+
+    try:
+        data = orjson.loads(request.body)
+        models = data.get('models')
+        user_id = data.get('user_id', 'default_user')
+    except Exception as e:
+        return _json_response({'error': f'Invalid request: {str(e)}'}, status=400)
+
+    if not isinstance(models, list) or not models or not all(isinstance(model, str) for model in models):
+        return _json_response({'error': 'models must be a non-empty list of strings'}, status=400)
+    if len(models) > CAPABILITY_BATCH_MAX_MODELS:
+        return _json_response({'error': f'At most {CAPABILITY_BATCH_MAX_MODELS} models per request'}, status=400)
+
+    try:
+        settings = await aget_cached_settings(user_id)
+    except UserSettings.DoesNotExist:
+        return _json_response({'error': 'User settings not found'}, status=400)
+
+    if not settings.api_key:
+        return _json_response({'error': 'API key not configured'}, status=400)
+
+    url, headers = build_endpoint(settings.base_url, settings.api_key)
+    semaphore = asyncio.Semaphore(CAPABILITY_PROBE_CONCURRENCY)
+
+    async def probe(model):
+        async with semaphore:
+            return await _probe_capabilities(url, headers, model)
+
+    results = await asyncio.gather(*(probe(model) for model in models))
+    return _json_response({'results': results})
@@ -0,0 +1,77 @@
+"""
+Function-calling capability probe shared by the sync and async chat views
+"""
+import logging
+import orjson
+
+logger = logging.getLogger(__name__)
+
+# Minimal tool definition used to probe for function calling support
+TEST_TOOL = {
+    "type": "function",
+    "function": {
+        "name": "get_current_time",
+        "description": "Get the current time",
+        "parameters": {
+            "type": "object",
+            "properties": {},
+            "required": []
+        }
+    }
+}
+
+# Some providers return 400 with these in the error for unsupported features
+TOOL_ERROR_MARKERS = ('tool', 'function', 'not support', 'unsupported')
+
+
+def build_probe_body(model):
+    """Encoded chat completion request that asks the model to use a tool"""
+    # Try OpenAI format first (works for OpenAI, OpenRouter, etc.)
+    return orjson.dumps({
+        "model": model,
+        "messages": [{"role": "user", "content": "What time is it?"}],
+        "tools": [TEST_TOOL],
+        "max_tokens": 10,  # Minimal tokens to save cost
+        "temperature": 0
+    })
+
+
+def classify_probe(model, status_code, body):
+    """
+    Turn the probe's HTTP status and body into the capability result
+    Raises ValueError if a 400 body is not JSON.
+    """
+    if status_code == 200:
+        # Model accepts tools parameter - supports function calling
+        logger.info(f"Model {model} supports function calling (200 response)")
+        return {
+            'supportsFunctionCalling': True,
+            'model': model
+        }
+
+    if status_code == 400:
+        # Check error message to determine if it's a tool-related error
+        error_message = str(orjson.loads(body)).lower()
+
+        if any(x in error_message for x in TOOL_ERROR_MARKERS):
+            logger.info(f"Model {model} does not support function calling (400 with tool error)")
+            return {
+                'supportsFunctionCalling': False,
+                'model': model
+            }
+
+        # Other 400 errors might be due to different reasons
+        logger.warning(f"Unclear capability for {model}: {error_message}")
+        return {
+            'supportsFunctionCalling': None,
+            'model': model,
+            'error': 'Unable to determine capability'
+        }
+
+    # Unexpected status code
+    logger.warning(f"Unexpected response testing {model}: {status_code}")
+    return {
+        'supportsFunctionCalling': None,
+        'model': model,
+        'error': f'Unexpected API response: {status_code}'
+    }
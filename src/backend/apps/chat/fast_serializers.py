@@ -0,0 +1,54 @@
+"""
+Read-only serializers for hot list endpoints
+Build the same payload as MessageSerializer straight from values() rows,
+skipping DRF field machinery. Write paths keep using MessageSerializer.
+"""
+import orjson
+from apps.common.serializers import iso_datetime
+
+MESSAGE_VALUES = (
+    'id', 'conversation_id', 'role', 'content', 'metadata',
+    'created_at', 'token_count', 'importance_score', 'is_summarized'
+)
+
+# Rows fetched per server-side cursor round trip when streaming
+MESSAGE_STREAM_CHUNK = 500
+
+
+def serialize_messages(rows):
+    """Serialize Message.values(*MESSAGE_VALUES) rows"""
+    return [
+        {
+            'id': r['id'],
+            'conversationId': r['conversation_id'],
+            'role': r['role'],
+            'content': r['content'],
+            'metadata': r['metadata'],
+            'createdAt': iso_datetime(r['created_at']),
+            'tokenCount': r['token_count'],
+            'importanceScore': r['importance_score'],
+            'isSummarized': r['is_summarized']
+        }
+        for r in rows
+    ]
+
+
+async def aiter_messages_json(queryset):
+    """
+    Stream a values(*MESSAGE_VALUES) queryset as {"messages": [...]} JSON
+    Rows are read through a server-side cursor in chunks, so memory stays
+    bounded however long the conversation is.
+    """
+    yield b'{"messages":['
+    separator = b''
+    batch = []
+    async for row in queryset.aiterator(chunk_size=MESSAGE_STREAM_CHUNK):
+        batch.append(row)
+        if len(batch) >= MESSAGE_STREAM_CHUNK:
+            # Strip the list brackets so chunks join into one array
+            yield separator + orjson.dumps(serialize_messages(batch))[1:-1]
+            separator = b','
+            batch = []
+    if batch:
+        yield separator + orjson.dumps(serialize_messages(batch))[1:-1]
+    yield b']}'
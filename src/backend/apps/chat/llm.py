@@ -0,0 +1,133 @@
+"""
+Shared HTTP clients for upstream LLM API calls
+"""
+import asyncio
+import os
+import threading
+from functools import lru_cache
+from typing import NamedTuple
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from cachetools import TTLCache
+from apps.settings.cache import aget_cached_settings
+
+# Provider defaults, read once at import
+OPENAI_API_BASE = os.getenv('OPENAI_API_BASE', 'https://api.openai.com/v1')
+OPENROUTER_REFERER = os.getenv('OPENROUTER_REFERER', 'http://localhost:20001')
+OPENROUTER_APP_NAME = os.getenv('OPENROUTER_APP_NAME', 'Mini Chatbox')
+
+# One client per process so concurrent streams share the connection pool.
+# Idle connections are kept for a while so follow-up prompts skip the TLS
+# handshake. Fail fast on connect; no read timeout, since SSE streams may
+# legitimately idle between tokens.
+llm_client = httpx.AsyncClient(
+    http2=True,
+    limits=httpx.Limits(max_connections=200, max_keepalive_connections=100, keepalive_expiry=300.0),
+    timeout=httpx.Timeout(60.0, connect=5.0, read=None),
+    headers={'User-Agent': 'mini-chatbox/1.0'}
+)
+
+
+# Pooled session for the remaining sync (requests-based) calls; reusing it
+# keeps TLS connections to the provider alive between requests
+llm_session = requests.Session()
+llm_session.mount('https://', HTTPAdapter(pool_connections=50, pool_maxsize=200, max_retries=Retry(total=0)))
+
+
+def close_llm_client():
+    """Close pooled upstream connections at interpreter exit"""
+    if llm_client.is_closed:
+        return
+    try:
+        asyncio.run(llm_client.aclose())
+    except Exception:
+        # The serving event loop is already gone; sockets close with the process
+        pass
+
+
+_RC = frozenset(('role', 'content'))
+
+
+def to_api_messages(messages):
+    """
+    Reduce chat messages to the role/content pairs the API expects
+    Messages already in that shape are passed through without copying
+    """
+    return [
+        m if m.keys() == _RC else {'role': m.get('role', 'user'), 'content': m.get('content', '')}
+        for m in messages
+    ]
+
+
+class ChatTarget(NamedTuple):
+    """
+    Per-user upstream request parts that only change with UserSettings
+    """
+    url: str
+    headers: dict
+    payload_template: dict
+
+
+@lru_cache(maxsize=256)
+def build_endpoint(base_url, api_key):
+    """
+    Get the chat completions URL and request headers for a provider
+    Cached per (base_url, api_key); callers must not mutate the headers
+    """
+    base_url = base_url or OPENAI_API_BASE
+    base_url = base_url.rstrip('/')
+    if not base_url.endswith('/v1'):
+        base_url = f"{base_url}/v1"
+
+    headers = {
+        'Authorization': f'Bearer {api_key}',
+        'Content-Type': 'application/json'
+    }
+
+    # Add OpenRouter specific headers if needed
+    if 'openrouter.ai' in base_url.lower():
+        headers['HTTP-Referer'] = OPENROUTER_REFERER
+        headers['X-Title'] = OPENROUTER_APP_NAME
+
+    return f"{base_url}/chat/completions", headers
+
+
+def build_chat_target(settings):
+    """Build the completions URL, headers and payload defaults for a user"""
+    url, headers = build_endpoint(settings.base_url, settings.api_key)
+    return ChatTarget(
+        url=url,
+        headers=headers,
+        payload_template={
+            'stream': True,
+            'temperature': settings.temperature,
+            'max_tokens': settings.max_tokens,
+            'top_p': settings.top_p
+        }
+    )
+
+
+# Entries are (settings, target); a target is reused only while the settings
+# cache still returns the very same instance, so settings invalidation
+# carries over without a separate hook
+_target_cache = TTLCache(maxsize=4096, ttl=30)
+_target_lock = threading.Lock()
+
+
+async def aget_chat_target(user_id):
+    """
+    Get the user's settings and their precomputed ChatTarget
+    Raises UserSettings.DoesNotExist if there are none.
+    """
+    settings = await aget_cached_settings(user_id)
+    with _target_lock:
+        entry = _target_cache.get(user_id)
+    if entry is not None and entry[0] is settings:
+        return settings, entry[1]
+
+    target = build_chat_target(settings)
+    with _target_lock:
+        _target_cache[user_id] = (settings, target)
+    return settings, target
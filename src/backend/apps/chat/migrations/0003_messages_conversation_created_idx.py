@@ -0,0 +1,23 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ("chat", "0002_alter_message_options_delete_attachment"),
+    ]
+
+    operations = [
+        # messages is unmanaged (schema owned by init.sql), so the index is
+        # created with raw SQL. Lets history queries filter by conversation
+        # and walk created_at order straight off the index.
+        migrations.RunSQL(
+            sql=(
+                "CREATE INDEX CONCURRENTLY IF NOT EXISTS messages_conv_created "
+                "ON messages (conversation_id, created_at DESC)"
+            ),
+            reverse_sql="DROP INDEX CONCURRENTLY IF EXISTS messages_conv_created",
+        ),
+    ]
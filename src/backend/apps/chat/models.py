@@ -1,4 +1,5 @@
 from django.db import models
+from apps.conversation.models import Conversation
 
 
 class Message(models.Model):
@@ -10,7 +11,18 @@ class Message(models.Model):
     ]
 
     id = models.AutoField(primary_key=True)
-    conversation_id = models.IntegerField(db_index=True, null=True, blank=True)
+    # Plain integer column in the DB (no FK constraint); declared as a
+    # ForeignKey so queries can select_related/prefetch the conversation
+    conversation = models.ForeignKey(
+        Conversation,
+        on_delete=models.DO_NOTHING,
+        related_name='messages',
+        db_column='conversation_id',
+        db_constraint=False,
+        db_index=True,
+        null=True,
+        blank=True
+    )
     role = models.CharField(max_length=20, choices=MESSAGE_ROLES)
     content = models.TextField()
     metadata = models.JSONField(default=dict, blank=True, null=True)
@@ -23,6 +35,11 @@ class Message(models.Model):
         db_table = 'messages'
         managed = False  # Don't let Django manage this table
         ordering = ['created_at']
+        # Created by init.sql / migration 0003; backs per-conversation
+        # history scans ordered by time
+        indexes = [
+            models.Index(fields=['conversation', '-created_at'], name='messages_conv_created'),
+        ]
 
     def __str__(self):
         return f"{self.role}: {self.content[:50]}"
\ No newline at end of file
@@ -0,0 +1,16 @@
+from rest_framework.pagination import CursorPagination
+from apps.common.responses import ORJSONResponse
+
+
+class MessageCursorPagination(CursorPagination):
+    """
+    Cursor pagination for chat history, walking messages in creation order.
+    Keeps memory and response time constant regardless of conversation length.
+    """
+    ordering = ('created_at', 'id')
+    page_size = 50
+    page_size_query_param = 'limit'
+    max_page_size = 500
+
+    def get_paginated_response(self, data):
+        return ORJSONResponse(super().get_paginated_response(data).data)
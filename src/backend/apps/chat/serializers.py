@@ -1,8 +1,9 @@
 from rest_framework import serializers
+from apps.common.serializers import CachedModelSerializer, iso_datetime
 from .models import Message
 
 
-class MessageSerializer(serializers.ModelSerializer):
+class MessageSerializer(CachedModelSerializer):
     conversationId = serializers.IntegerField(source='conversation_id')
     createdAt = serializers.DateTimeField(source='created_at', read_only=True)
     tokenCount = serializers.IntegerField(source='token_count', required=False, allow_null=True)
@@ -14,6 +15,21 @@ class MessageSerializer(serializers.ModelSerializer):
         fields = ['id', 'conversationId', 'role', 'content', 'metadata', 'createdAt', 'tokenCount', 'importanceScore', 'isSummarized']
         read_only_fields = ['id', 'createdAt']
 
+    def to_representation(self, instance):
+        # The declared fields only rename columns; build the output directly
+        # instead of running every field's get_attribute/to_representation
+        return {
+            'id': instance.id,
+            'conversationId': instance.conversation_id,
+            'role': instance.role,
+            'content': instance.content,
+            'metadata': instance.metadata,
+            'createdAt': iso_datetime(instance.created_at),
+            'tokenCount': instance.token_count,
+            'importanceScore': instance.importance_score,
+            'isSummarized': instance.is_summarized
+        }
+
 
 class ChatRequestSerializer(serializers.Serializer):
     messages = serializers.ListField(
@@ -0,0 +1,89 @@
+"""
+Helpers for parsing upstream Server-Sent Events (OpenAI-compatible streams)
+"""
+import logging
+import orjson
+
+logger = logging.getLogger(__name__)
+
+
+def iter_sse_data(buffer):
+    """
+    Pop complete lines off a bytearray buffer and yield their SSE payloads.
+
+    Lines are consumed from the front of ``buffer`` in place; a trailing
+    partial line is left for the next read. Blank lines and comments are
+    skipped and the ``data: `` prefix is stripped. Payloads stay as bytes.
+    """
+    while True:
+        newline = buffer.find(b'\n')
+        if newline < 0:
+            return
+
+        line = bytes(buffer[:newline]).strip()
+        del buffer[:newline + 1]
+
+        if not line or line.startswith(b':'):
+            continue
+
+        if line.startswith(b'data: '):
+            line = line[6:]
+
+        yield line
+
+
+_CONTENT_KEY = b'"content":"'
+
+
+def extract_content_bytes(data):
+    """
+    Pull the delta content out of a chunk payload without a JSON parse.
+
+    Returns the raw UTF-8 content bytes, or None when the payload needs a
+    full parse: no plain content string, escape sequences inside it, or a
+    finish_reason set.
+    """
+    start = data.find(_CONTENT_KEY)
+    if start < 0 or b'"finish_reason":"' in data:
+        return None
+
+    start += len(_CONTENT_KEY)
+    end = data.find(b'"', start)
+    if end < 0:
+        return None
+
+    content = data[start:end]
+    if b'\\' in content:
+        return None
+    return content
+
+
+def iter_deltas(buffer):
+    """
+    Pop complete lines off a bytearray buffer and yield (content, finished).
+
+    ``content`` is the delta's UTF-8 bytes, possibly empty. ``finished`` is
+    True for [DONE] and for a chunk with a finish_reason; callers stop
+    there. Chunks that are not valid JSON are logged and skipped.
+    """
+    for data in iter_sse_data(buffer):
+        if data == b'[DONE]':
+            yield b'', True
+            return
+
+        # Plain content deltas are forwarded as-is
+        content = extract_content_bytes(data)
+        if content is not None:
+            yield content, False
+            continue
+
+        try:
+            chunk = orjson.loads(data)
+        except orjson.JSONDecodeError as e:
+            logger.warning(f"Failed to parse chunk: {data[:100]!r} - {e}")
+            continue
+
+        choices = chunk.get('choices', [])
+        if choices:
+            content = choices[0].get('delta', {}).get('content') or ''
+            yield content.encode('utf-8'), bool(choices[0].get('finish_reason'))
@@ -0,0 +1,298 @@
+import asyncio
+import contextlib
+from unittest import mock
+import httpx
+import orjson
+import requests
+from django.core.cache import cache
+from django.test import TestCase
+from apps.conversation.models import Conversation
+from apps.settings.models import UserSettings
+from . import views, writer
+from .asgi_views import CAPABILITY_BATCH_MAX_MODELS, CAPABILITY_PROBE_CONCURRENCY
+from .models import Message
+
+
+STREAM_URL = '/api/chat/stream/'
+
+
+def _sse(*payloads):
+    """An upstream chat completions stream ending in [DONE]"""
+    return b''.join(b'data: ' + orjson.dumps(payload) + b'\n\n' for payload in payloads) + b'data: [DONE]\n\n'
+
+
+def _delta(content, finish_reason=None):
+    return {'choices': [{'delta': {'content': content}, 'finish_reason': finish_reason}]}
+
+
+async def _wait_for(count, expected):
+    """Poll an async count until it reaches expected, for at most ~2s"""
+    for _ in range(200):
+        value = await count()
+        if value >= expected:
+            return value
+        await asyncio.sleep(0.01)
+    return value
+
+
+async def _stop_writer():
+    flusher = writer._flusher
+    if flusher is not None and not flusher.done():
+        flusher.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await flusher
+
+
+class MessageWriterTests(TestCase):
+    async def test_queued_messages_are_inserted(self):
+        first = await Conversation.objects.acreate(session_id='writer-1', title='One')
+        second = await Conversation.objects.acreate(session_id='writer-2', title='Two')
+        try:
+            for conversation_id in (first.id, first.id, second.id):
+                writer.enqueue_message(Message(conversation_id=conversation_id, role='assistant', content='reply'))
+            saved = await _wait_for(Message.objects.acount, 3)
+        finally:
+            await _stop_writer()
+
+        self.assertEqual(saved, 3)
+        self.assertEqual(await Message.objects.filter(conversation_id=first.id).acount(), 2)
+        self.assertEqual(await Message.objects.filter(conversation_id=second.id).acount(), 1)
+
+    async def test_failed_batch_does_not_stop_the_writer(self):
+        conversation = await Conversation.objects.acreate(session_id='writer-3', title='Three')
+        abulk_create = Message.objects.abulk_create
+        calls = []
+
+        async def flaky_bulk_create(*args, **kwargs):
+            calls.append(args)
+            if len(calls) == 1:
+                raise RuntimeError('database unavailable')
+            return await abulk_create(*args, **kwargs)
+
+        try:
+            with mock.patch.object(Message.objects, 'abulk_create', flaky_bulk_create), \
+                    self.assertLogs('apps.chat.writer', 'ERROR'):
+                writer.enqueue_message(Message(conversation_id=conversation.id, role='assistant', content='lost'))
+                await _wait_for(lambda: asyncio.sleep(0, len(calls)), 1)
+                writer.enqueue_message(Message(conversation_id=conversation.id, role='assistant', content='kept'))
+                await _wait_for(Message.objects.acount, 1)
+        finally:
+            await _stop_writer()
+
+        self.assertEqual([message.content async for message in Message.objects.all()], ['kept'])
+
+
+class MessageWriterCountTests(TestCase):
+    async def test_conversation_counters_are_bumped(self):
+        first = await Conversation.objects.acreate(session_id='writer-count-1', title='One', message_count=4)
+        second = await Conversation.objects.acreate(session_id='writer-count-2', title='Two')
+        started = first.last_activity
+        try:
+            for conversation_id in (first.id, first.id, second.id):
+                writer.enqueue_message(Message(conversation_id=conversation_id, role='assistant', content='reply'))
+            await _wait_for(Message.objects.acount, 3)
+            await _wait_for(
+                lambda: Conversation.objects.filter(pk=second.pk, message_count=1).acount(), 1
+            )
+        finally:
+            await _stop_writer()
+
+        first = await Conversation.objects.aget(pk=first.pk)
+        second = await Conversation.objects.aget(pk=second.pk)
+        self.assertEqual((first.message_count, second.message_count), (6, 1))
+        self.assertGreater(first.last_activity, started)
+
+    async def test_unsaved_messages_are_logged_on_shutdown(self):
+        conversation = await Conversation.objects.acreate(session_id='writer-count-3', title='Three')
+        with self.assertLogs('apps.chat.writer', 'WARNING') as logs:
+            writer.enqueue_message(Message(conversation_id=conversation.id, role='assistant', content='reply'))
+            # Cancel while the flusher is still collecting its batch
+            await asyncio.sleep(0)
+            await _stop_writer()
+        self.assertIn('1 unsaved', logs.output[0])
+
+
+class ChatStreamTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        UserSettings.objects.create(user_id='stream-user', api_key='key', base_url='https://llm.example/v1')
+        self.requests = []
+
+    def _upstream(self, handler):
+        def record(request):
+            self.requests.append(request)
+            return handler(request)
+
+        client = httpx.AsyncClient(transport=httpx.MockTransport(record))
+        return mock.patch('apps.chat.views.llm_client', client)
+
+    async def _stream(self, **body):
+        body.setdefault('user_id', 'stream-user')
+        body.setdefault('messages', [{'role': 'user', 'content': 'Hi'}])
+        response = await self.async_client.post(STREAM_URL, body, content_type='application/json')
+        return response, b''.join([chunk async for chunk in response.streaming_content])
+
+    async def test_streams_content_deltas(self):
+        upstream = _sse(_delta('Hel'), _delta('lo "there"'), _delta(''), _delta('!', finish_reason='stop'))
+        with self._upstream(lambda request: httpx.Response(200, content=upstream)):
+            response, content = await self._stream(options={'model': 'gpt-4o'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/plain; charset=utf-8')
+        self.assertEqual(content.decode(), 'Hello "there"!')
+
+        sent = self.requests[0]
+        self.assertEqual(str(sent.url), 'https://llm.example/v1/chat/completions')
+        self.assertEqual(sent.headers['Authorization'], 'Bearer key')
+        payload = orjson.loads(sent.content)
+        self.assertEqual(payload['model'], 'gpt-4o')
+        self.assertEqual(payload['messages'], [{'role': 'user', 'content': 'Hi'}])
+        self.assertTrue(payload['stream'])
+
+    async def test_stops_at_done(self):
+        upstream = _sse(_delta('one')) + b'data: ' + orjson.dumps(_delta('ignored')) + b'\n\n'
+        with self._upstream(lambda request: httpx.Response(200, content=upstream)):
+            _, content = await self._stream()
+        self.assertEqual(content, b'one')
+
+    async def test_upstream_error_is_reported(self):
+        with self._upstream(lambda request: httpx.Response(401, content=b'bad key')):
+            _, content = await self._stream()
+        self.assertEqual(content, b'[ERROR]: API error: bad key')
+
+    async def test_upstream_timeout_is_reported(self):
+        def timeout(request):
+            raise httpx.ReadTimeout('slow', request=request)
+
+        with self._upstream(timeout):
+            _, content = await self._stream()
+        self.assertEqual(content, b'[ERROR]: Request timeout')
+
+    async def test_rejects_invalid_messages(self):
+        response = await self.async_client.post(
+            STREAM_URL, {'user_id': 'stream-user', 'messages': 'Hi'}, content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 400)
+
+    async def test_closing_the_response_stops_a_blocked_reader(self):
+        upstream = _sse(*(_delta(f'{i} ') for i in range(200)))
+        with self._upstream(lambda request: httpx.Response(200, content=upstream)):
+            content = views._astream_content('https://llm.example/v1/chat/completions', {}, b'{}')
+            await anext(content)
+            # Let the reader fill the queue again, then go away mid-stream
+            await asyncio.sleep(0.05)
+            await content.aclose()
+            await asyncio.sleep(0.05)
+
+        readers = [task for task in asyncio.all_tasks() if task.get_coro().__name__ == '_aread_upstream']
+        self.assertEqual(readers, [])
+
+    def _sync_upstream(self, content=b'', status_code=200, **kwargs):
+        api_response = mock.MagicMock(status_code=status_code, content=content)
+        api_response.__enter__.return_value = api_response
+        # Split mid-line so lines are rebuilt across reads
+        api_response.iter_content.return_value = [content[:15], content[15:]]
+        return mock.patch('apps.chat.views.llm_session.post', return_value=api_response, **kwargs)
+
+    def _sync_stream(self):
+        response = self.client.post(
+            STREAM_URL, {'user_id': 'stream-user', 'messages': [{'role': 'user', 'content': 'Hi'}]},
+            content_type='application/json'
+        )
+        return response, b''.join(response.streaming_content)
+
+    def test_wsgi_streams_from_a_sync_iterator(self):
+        upstream = _sse(_delta('Hel'), _delta('lo "there"'), _delta('!', finish_reason='stop'))
+        with self._sync_upstream(upstream) as post:
+            response, content = self._sync_stream()
+
+        self.assertFalse(response.is_async)
+        self.assertEqual(content.decode(), 'Hello "there"!')
+        url = post.call_args.args[0]
+        self.assertEqual(url, 'https://llm.example/v1/chat/completions')
+        self.assertTrue(post.call_args.kwargs['stream'])
+        self.assertEqual(orjson.loads(post.call_args.kwargs['data'])['messages'], [{'role': 'user', 'content': 'Hi'}])
+
+    def test_wsgi_upstream_errors_are_reported(self):
+        with self._sync_upstream(b'bad key', status_code=401):
+            _, content = self._sync_stream()
+        self.assertEqual(content, b'[ERROR]: API error: bad key')
+
+        with self._sync_upstream(side_effect=requests.ReadTimeout('slow')):
+            _, content = self._sync_stream()
+        self.assertEqual(content, b'[ERROR]: Request timeout')
+
+    def test_missing_api_key_is_a_plain_response(self):
+        UserSettings.objects.create(user_id='no-key')
+        for user_id, message in (
+            ('nobody', 'Please configure your settings first.'),
+            ('no-key', 'Please add your API key in settings.'),
+        ):
+            with self.subTest(user_id=user_id):
+                response = self.client.post(
+                    STREAM_URL, {'user_id': user_id, 'messages': [{'role': 'user', 'content': 'Hi'}]},
+                    content_type='application/json'
+                )
+                self.assertFalse(response.streaming)
+                self.assertEqual(response.content.decode(), f'[ERROR]: API key not configured. {message}')
+                self.assertEqual(response['Cache-Control'], 'no-cache')
+
+
+class TestStreamTests(TestCase):
+    TICKS = ''.join(f'data: tick {i}\n\n' for i in range(1, 11))
+
+    def test_sync_iterator_under_wsgi(self):
+        with mock.patch('apps.chat.views.time.sleep') as sleep:
+            response = self.client.get('/api/chat/test-stream/')
+            content = b''.join(response.streaming_content)
+        self.assertFalse(response.is_async)
+        self.assertEqual(content.decode(), self.TICKS)
+        self.assertEqual(sleep.call_count, 10)
+
+    async def test_async_iterator_under_asgi(self):
+        with mock.patch('apps.chat.views.asyncio.sleep', new=mock.AsyncMock()):
+            response = await self.async_client.get('/api/chat/test-stream/')
+            content = b''.join([chunk async for chunk in response.streaming_content])
+        self.assertTrue(response.is_async)
+        self.assertEqual(content.decode(), self.TICKS)
+
+
+class CapabilitiesBatchTests(TestCase):
+    URL = '/api/chat/test-capabilities-batch/'
+
+    def setUp(self):
+        UserSettings.objects.create(user_id='probe-user', api_key='key', base_url='https://llm.example/v1')
+
+    async def _post(self, models):
+        return await self.async_client.post(
+            self.URL, {'user_id': 'probe-user', 'models': models}, content_type='application/json'
+        )
+
+    async def test_probes_run_with_bounded_concurrency(self):
+        in_flight = []
+        peak = []
+
+        async def probe(request):
+            in_flight.append(request)
+            peak.append(len(in_flight))
+            await asyncio.sleep(0.01)
+            in_flight.remove(request)
+            return httpx.Response(200, json={})
+
+        models = [f'model-{i}' for i in range(CAPABILITY_BATCH_MAX_MODELS)]
+        client = httpx.AsyncClient(transport=httpx.MockTransport(probe))
+        with mock.patch('apps.chat.asgi_views.llm_client', client):
+            response = await self._post(models)
+
+        self.assertEqual(response.status_code, 200)
+        results = orjson.loads(response.content)['results']
+        self.assertEqual([result['model'] for result in results], models)
+        self.assertTrue(all(result['supportsFunctionCalling'] for result in results))
+        self.assertEqual(max(peak), CAPABILITY_PROBE_CONCURRENCY)
+
+    async def test_rejects_invalid_model_lists(self):
+        too_many = [f'model-{i}' for i in range(CAPABILITY_BATCH_MAX_MODELS + 1)]
+        for models in ([], 'gpt-4o', ['gpt-4o', 1], ['gpt-4o', {'id': 'x'}], too_many):
+            with self.subTest(models=models):
+                response = await self._post(models)
+                self.assertEqual(response.status_code, 400)
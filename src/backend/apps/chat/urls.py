@@ -1,7 +1,7 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import ChatViewSet
-from .asgi_views import chat_stream_asgi
+from .asgi_views import chat_stream_asgi, test_capabilities_batch
 from .asgi_streaming import test_stream_raw_asgi
 
 router = DefaultRouter()
@@ -12,5 +12,7 @@ urlpatterns = [
     path('test-stream-raw/', test_stream_raw_asgi, name='test-stream-raw'),
     # Native ASGI streaming endpoint (bypasses Django's buffering)
     path('stream-asgi/', chat_stream_asgi, name='chat-stream-asgi'),
+    # Concurrent capability tests for several models (async view)
+    path('test-capabilities-batch/', test_capabilities_batch, name='chat-test-capabilities-batch'),
     path('', include(router.urls)),
 ]
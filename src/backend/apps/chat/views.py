@@ -2,20 +2,136 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny
-from django.http import StreamingHttpResponse
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
 from .models import Message
-from .serializers import MessageSerializer, ChatRequestSerializer
+from .serializers import ChatRequestSerializer
+from .pagination import MessageCursorPagination
+from .fast_serializers import serialize_messages, MESSAGE_VALUES
+from .llm import llm_client, llm_session, build_endpoint, to_api_messages
+from .sse import iter_deltas
+from .capabilities import build_probe_body, classify_probe
 from apps.settings.models import UserSettings
-import json
+from apps.settings.cache import get_user_settings
+from apps.common.responses import ORJSONResponse
+import asyncio
+import httpx
+import orjson
 import time
-import os
 import requests
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Upstream deltas read ahead of the client by the async stream
+STREAM_PREFETCH = 32
+
+
+def _error_response(message):
+    """Errors known before streaming starts are sent as one plain response"""
+    response = HttpResponse(message, content_type='text/plain; charset=utf-8')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+def _is_asgi(request):
+    """Async iterators are streamed by the ASGI handler; WSGI servers buffer them"""
+    return isinstance(request._request, ASGIRequest)
+
+
+async def _aread_upstream(queue, url, headers, body):
+    """Read and parse the LLM stream, queueing content deltas as bytes, then None"""
+    try:
+        async with llm_client.stream('POST', url, headers=headers, content=body) as api_response:
+            if api_response.status_code != 200:
+                error_text = (await api_response.aread()).decode('utf-8', errors='replace')
+                logger.error(f"LLM API error: {api_response.status_code} - {error_text}")
+                await queue.put(f"[ERROR]: API error: {error_text}".encode())
+            else:
+                buffer = bytearray()
+                finished = False
+                async for byte_chunk in api_response.aiter_bytes():
+                    buffer += byte_chunk
+                    for content, finished in iter_deltas(buffer):
+                        if content:
+                            await queue.put(content)
+                        if finished:
+                            break
+                    if finished:
+                        break
+
+    except httpx.TimeoutException:
+        logger.error("LLM API request timeout")
+        await queue.put(b"[ERROR]: Request timeout")
+
+    except Exception as e:
+        logger.error(f"Error streaming response: {str(e)}")
+        await queue.put(f"[ERROR]: {str(e)}".encode())
+
+    # Not in a finally: a cancelled reader has no consumer left to make
+    # room in a full queue, so waiting to put the sentinel would never end
+    await queue.put(None)
+
+
+async def _astream_content(url, headers, body):
+    """Async generator for plain text streaming (like Node.js version)"""
+    # Upstream is read in its own task so the next chunk is fetched
+    # and parsed while the current one is being sent to the client
+    queue = asyncio.Queue(maxsize=STREAM_PREFETCH)
+    reader = asyncio.ensure_future(_aread_upstream(queue, url, headers, body))
+    try:
+        finished = False
+        while not finished:
+            content = await queue.get()
+            if content is None:
+                return
+
+            # Coalesce deltas that are already waiting into one write;
+            # never waits for more, so there is no added latency
+            parts = [content]
+            while not queue.empty():
+                content = queue.get_nowait()
+                if content is None:
+                    finished = True
+                    break
+                parts.append(content)
+
+            # Yield raw content directly (like Node.js)
+            yield b''.join(parts)
+    finally:
+        reader.cancel()
+
+
+def _stream_content(url, headers, body):
+    """Sync counterpart of _astream_content, for requests served over WSGI"""
+    try:
+        with llm_session.post(url, headers=headers, data=body, stream=True, timeout=(5, None)) as api_response:
+            if api_response.status_code != 200:
+                error_text = api_response.content.decode('utf-8', errors='replace')
+                logger.error(f"LLM API error: {api_response.status_code} - {error_text}")
+                yield f"[ERROR]: API error: {error_text}".encode()
+                return
+
+            buffer = bytearray()
+            for byte_chunk in api_response.iter_content(chunk_size=None):
+                buffer += byte_chunk
+                for content, finished in iter_deltas(buffer):
+                    if content:
+                        yield content
+                    if finished:
+                        return
+
+    except requests.Timeout:
+        logger.error("LLM API request timeout")
+        yield b"[ERROR]: Request timeout"
+
+    except Exception as e:
+        logger.error(f"Error streaming response: {str(e)}")
+        yield f"[ERROR]: {str(e)}".encode()
+
 
 class ChatViewSet(viewsets.ViewSet):
     permission_classes = [AllowAny]
@@ -52,7 +168,7 @@ class ChatViewSet(viewsets.ViewSet):
             }
         }
 
-        return Response(response_data, status=status.HTTP_200_OK)
+        return ORJSONResponse(response_data, status=status.HTTP_200_OK)
 
     @action(detail=False, methods=['post'])
     @method_decorator(csrf_exempt)
@@ -61,13 +177,18 @@ class ChatViewSet(viewsets.ViewSet):
         Streaming chat response - POST /api/chat/stream
         Returns Server-Sent Events (SSE) stream
         """
-        serializer = ChatRequestSerializer(data=request.data)
-        if not serializer.is_valid():
-            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
-
-        # Get message from either 'messages' array or 'message' string
-        messages = serializer.validated_data.get('messages', [])
-        options = serializer.validated_data.get('options', {})
+        # Validate by hand; only messages and options are used here, so the
+        # full ChatRequestSerializer is not worth its cost on every stream
+        data = request.data
+        messages = data.get('messages') or []
+        options = data.get('options') or {}
+
+        if not isinstance(messages, list) or not all(isinstance(msg, dict) for msg in messages):
+            return Response({'error': 'messages must be a list of objects'}, status=status.HTTP_400_BAD_REQUEST)
+        if not isinstance(options, dict):
+            return Response({'error': 'options must be an object'}, status=status.HTTP_400_BAD_REQUEST)
+        if not messages and not data.get('message'):
+            return Response({'error': "Either 'messages' or 'message' field is required"}, status=status.HTTP_400_BAD_REQUEST)
 
         # Get model from options
         model = options.get('model', 'gpt-4')
@@ -76,55 +197,19 @@ class ChatViewSet(viewsets.ViewSet):
         user_id = request.data.get('user_id', 'default_user')
 
         try:
-            settings = UserSettings.objects.get(user_id=user_id)
+            settings = get_user_settings(user_id)
         except UserSettings.DoesNotExist:
             # Return error if settings not found
-            def error_stream():
-                yield "[ERROR]: API key not configured. Please configure your settings first."
-
-            response = StreamingHttpResponse(
-                error_stream(),
-                content_type='text/plain; charset=utf-8'
-            )
-            response['Cache-Control'] = 'no-cache'
-            response['X-Accel-Buffering'] = 'no'
-            return response
+            return _error_response("[ERROR]: API key not configured. Please configure your settings first.")
 
         if not settings.api_key:
-            def error_stream():
-                yield "[ERROR]: API key not configured. Please add your API key in settings."
-
-            response = StreamingHttpResponse(
-                error_stream(),
-                content_type='text/plain; charset=utf-8'
-            )
-            response['Cache-Control'] = 'no-cache'
-            response['X-Accel-Buffering'] = 'no'
-            return response
+            return _error_response("[ERROR]: API key not configured. Please add your API key in settings.")
 
         # Prepare API request
-        base_url = settings.base_url or os.getenv('OPENAI_API_BASE', 'https://api.openai.com/v1')
-        base_url = base_url.rstrip('/')
-        if not base_url.endswith('/v1'):
-            base_url = f"{base_url}/v1"
-
-        headers = {
-            'Authorization': f'Bearer {settings.api_key}',
-            'Content-Type': 'application/json'
-        }
-
-        # Add OpenRouter specific headers if needed
-        if 'openrouter.ai' in base_url.lower():
-            headers['HTTP-Referer'] = os.getenv('OPENROUTER_REFERER', 'http://localhost:20001')
-            headers['X-Title'] = os.getenv('OPENROUTER_APP_NAME', 'Mini Chatbox')
+        url, headers = build_endpoint(settings.base_url, settings.api_key)
 
         # Prepare messages for API
-        api_messages = []
-        for msg in messages:
-            api_messages.append({
-                'role': msg.get('role', 'user'),
-                'content': msg.get('content', '')
-            })
+        api_messages = to_api_messages(messages)
 
         payload = {
             'model': model,
@@ -135,89 +220,14 @@ class ChatViewSet(viewsets.ViewSet):
             'top_p': settings.top_p
         }
 
-        def event_stream():
-            """Generator function for plain text streaming (like Node.js version)"""
-            try:
-                # Make streaming request to LLM API
-                with requests.post(
-                    f"{base_url}/chat/completions",
-                    headers=headers,
-                    json=payload,
-                    stream=True,
-                    timeout=60
-                ) as api_response:
-
-                    if api_response.status_code != 200:
-                        error_text = api_response.text
-                        logger.error(f"LLM API error: {api_response.status_code} - {error_text}")
-                        yield f"[ERROR]: API error: {error_text}"
-                        return
-
-                    # Use raw response to get truly unbuffered streaming
-                    buffer = b''
-
-                    for byte_chunk in api_response.raw.stream(amt=1, decode_content=True):
-                        if not byte_chunk:
-                            continue
-
-                        buffer += byte_chunk
-
-                        # Process complete lines (ending with \n)
-                        while b'\n' in buffer:
-                            line_bytes, buffer = buffer.split(b'\n', 1)
-
-                            if not line_bytes:
-                                continue
-
-                            try:
-                                line_text = line_bytes.decode('utf-8').strip()
-                            except UnicodeDecodeError:
-                                continue
-
-                            # Skip empty lines and comments
-                            if not line_text or line_text.startswith(':'):
-                                continue
-
-                            # Remove 'data: ' prefix
-                            if line_text.startswith('data: '):
-                                line_text = line_text[6:]
-
-                            # Check for end of stream
-                            if line_text.strip() == '[DONE]':
-                                return
-
-                            try:
-                                # Parse the JSON chunk
-                                chunk_data = json.loads(line_text)
-
-                                # Extract content delta
-                                choices = chunk_data.get('choices', [])
-                                if choices:
-                                    delta = choices[0].get('delta', {})
-                                    content = delta.get('content', '')
-                                    finish_reason = choices[0].get('finish_reason')
-
-                                    if content:
-                                        # Yield raw content directly (like Node.js)
-                                        yield content
-
-                                    if finish_reason:
-                                        return
-
-                            except json.JSONDecodeError as e:
-                                logger.warning(f"Failed to parse chunk: {line_text[:100]} - {e}")
-                                continue
-
-            except requests.exceptions.Timeout:
-                logger.error("LLM API request timeout")
-                yield "[ERROR]: Request timeout"
-
-            except Exception as e:
-                logger.error(f"Error streaming response: {str(e)}")
-                yield f"[ERROR]: {str(e)}"
+        body = orjson.dumps(payload)
+        if _is_asgi(request):
+            deltas = _astream_content(url, headers, body)
+        else:
+            deltas = _stream_content(url, headers, body)
 
         response = StreamingHttpResponse(
-            streaming_content=event_stream(),
+            streaming_content=deltas,
             content_type='text/plain; charset=utf-8',
             status=200
         )
@@ -233,13 +243,18 @@ class ChatViewSet(viewsets.ViewSet):
         """
         Simple streaming test using SSE format (Server-Sent Events)
         """
-        import time
-
-        def sse_stream():
-            for i in range(1, 11):
-                # SSE format: "data: content\n\n"
-                yield f"data: tick {i}\n\n"
-                time.sleep(0.1)  # 100ms delay between each chunk
+        if _is_asgi(request):
+            async def sse_stream():
+                for i in range(1, 11):
+                    # SSE format: "data: content\n\n"
+                    yield f"data: tick {i}\n\n"
+                    await asyncio.sleep(0.1)  # 100ms delay between each chunk
+        else:
+            # WSGI servers only stream sync iterators
+            def sse_stream():
+                for i in range(1, 11):
+                    yield f"data: tick {i}\n\n"
+                    time.sleep(0.1)
 
         response = StreamingHttpResponse(
             streaming_content=sse_stream(),
@@ -261,101 +276,29 @@ class ChatViewSet(viewsets.ViewSet):
 
         try:
             # Get user settings for API key and base URL
-            settings = UserSettings.objects.get(user_id=user_id)
+            settings = get_user_settings(user_id)
             if not settings.api_key:
-                return Response({
+                return ORJSONResponse({
                     'error': 'API key not configured',
                     'supportsFunctionCalling': False,
                     'model': model
                 }, status=status.HTTP_400_BAD_REQUEST)
 
-            base_url = settings.base_url or os.getenv('OPENAI_API_BASE', 'https://api.openai.com/v1')
-            base_url = base_url.rstrip('/')
-            if not base_url.endswith('/v1'):
-                base_url = f"{base_url}/v1"
-
-            # Prepare a minimal test request with a tool/function
-            test_tool = {
-                "type": "function",
-                "function": {
-                    "name": "get_current_time",
-                    "description": "Get the current time",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {},
-                        "required": []
-                    }
-                }
-            }
-
-            # Try OpenAI format first (works for OpenAI, OpenRouter, etc.)
-            test_payload = {
-                "model": model,
-                "messages": [{"role": "user", "content": "What time is it?"}],
-                "tools": [test_tool],
-                "max_tokens": 10,  # Minimal tokens to save cost
-                "temperature": 0
-            }
-
-            headers = {
-                'Authorization': f'Bearer {settings.api_key}',
-                'Content-Type': 'application/json'
-            }
-
-            # Add OpenRouter specific headers if needed
-            if 'openrouter.ai' in base_url.lower():
-                headers['HTTP-Referer'] = os.getenv('OPENROUTER_REFERER', 'http://localhost:20001')
-                headers['X-Title'] = os.getenv('OPENROUTER_APP_NAME', 'Mini Chatbox')
+            url, headers = build_endpoint(settings.base_url, settings.api_key)
 
             # Make the test request
-            response = requests.post(
-                f"{base_url}/chat/completions",
+            response = llm_session.post(
+                url,
                 headers=headers,
-                json=test_payload,
+                data=build_probe_body(model),
                 timeout=30
             )
 
-            # Check if the request was successful
-            if response.status_code == 200:
-                # Model accepts tools parameter - supports function calling
-                logger.info(f"Model {model} supports function calling (200 response)")
-                return Response({
-                    'supportsFunctionCalling': True,
-                    'model': model
-                }, status=status.HTTP_200_OK)
-
-            elif response.status_code == 400:
-                # Check error message to determine if it's a tool-related error
-                error_data = response.json()
-                error_message = str(error_data).lower()
-
-                # Some providers return 400 with specific error messages about unsupported features
-                if any(x in error_message for x in ['tool', 'function', 'not support', 'unsupported']):
-                    logger.info(f"Model {model} does not support function calling (400 with tool error)")
-                    return Response({
-                        'supportsFunctionCalling': False,
-                        'model': model
-                    }, status=status.HTTP_200_OK)
-                else:
-                    # Other 400 errors might be due to different reasons
-                    logger.warning(f"Unclear capability for {model}: {error_message}")
-                    return Response({
-                        'supportsFunctionCalling': None,
-                        'model': model,
-                        'error': 'Unable to determine capability'
-                    }, status=status.HTTP_200_OK)
-
-            else:
-                # Unexpected status code
-                logger.warning(f"Unexpected response testing {model}: {response.status_code}")
-                return Response({
-                    'supportsFunctionCalling': None,
-                    'model': model,
-                    'error': f'Unexpected API response: {response.status_code}'
-                }, status=status.HTTP_200_OK)
+            result = classify_probe(model, response.status_code, response.content)
+            return ORJSONResponse(result, status=status.HTTP_200_OK)
 
         except UserSettings.DoesNotExist:
-            return Response({
+            return ORJSONResponse({
                 'error': 'User settings not found',
                 'supportsFunctionCalling': False,
                 'model': model
@@ -363,7 +306,7 @@ class ChatViewSet(viewsets.ViewSet):
 
         except requests.exceptions.Timeout:
             logger.error(f"Timeout testing capabilities for {model}")
-            return Response({
+            return ORJSONResponse({
                 'supportsFunctionCalling': None,
                 'model': model,
                 'error': 'Request timeout'
@@ -371,7 +314,7 @@ class ChatViewSet(viewsets.ViewSet):
 
         except Exception as e:
             logger.error(f"Error testing capabilities for {model}: {str(e)}")
-            return Response({
+            return ORJSONResponse({
                 'supportsFunctionCalling': None,
                 'model': model,
                 'error': str(e)
@@ -379,11 +322,15 @@ class ChatViewSet(viewsets.ViewSet):
 
     @action(detail=False, methods=['get'])
     def history(self, request):
-        """Get chat history for a conversation"""
+        """
+        Get chat history for a conversation
+        Paginated with a cursor so long conversations are never loaded at once
+        """
         conversation_id = request.query_params.get('conversation_id')
         if not conversation_id:
             return Response({'error': 'conversation_id required'}, status=status.HTTP_400_BAD_REQUEST)
 
-        messages = Message.objects.filter(conversation_id=conversation_id)
-        serializer = MessageSerializer(messages, many=True)
-        return Response(serializer.data)
+        messages = Message.objects.filter(conversation_id=conversation_id).values(*MESSAGE_VALUES)
+        paginator = MessageCursorPagination()
+        page = paginator.paginate_queryset(messages, request, view=self)
+        return paginator.get_paginated_response(serialize_messages(page))
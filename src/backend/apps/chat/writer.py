@@ -0,0 +1,82 @@
+"""
+Batched background persistence of chat messages
+Keeps DB write latency off the streaming response path
+"""
+import asyncio
+import logging
+from collections import Counter
+from django.db.models import F
+from django.utils import timezone
+from apps.conversation.models import Conversation
+from .models import Message
+
+logger = logging.getLogger(__name__)
+
+# Flush once this many messages are queued, or after waiting this long
+# for more to arrive
+BATCH_SIZE = 256
+BATCH_WAIT = 0.05
+
+_queue = None
+_flusher = None
+
+
+def enqueue_message(message):
+    """
+    Queue an unsaved Message for insertion by the background flusher
+    Must be called from within the running event loop
+    """
+    global _queue, _flusher
+    loop = asyncio.get_running_loop()
+    if _flusher is None or _flusher.done() or _flusher.get_loop() is not loop:
+        if _queue is not None and not _queue.empty():
+            # Left on a queue whose loop has moved on or whose flusher died
+            logger.warning(f"Dropping {_queue.qsize()} unsaved chat messages from a stale queue")
+        _queue = asyncio.Queue()
+        _flusher = loop.create_task(_flush_forever(_queue))
+    _queue.put_nowait(message)
+
+
+async def _flush_forever(queue):
+    batch = []
+    try:
+        while True:
+            batch = []
+            batch.append(await queue.get())
+            while len(batch) < BATCH_SIZE:
+                try:
+                    batch.append(await asyncio.wait_for(queue.get(), BATCH_WAIT))
+                except asyncio.TimeoutError:
+                    break
+
+            try:
+                await Message.objects.abulk_create(batch, batch_size=BATCH_SIZE)
+            except Exception as e:
+                logger.error(f"Failed to persist {len(batch)} chat messages: {str(e)}")
+                continue
+            saved = batch
+            batch = []
+
+            try:
+                await _bump_conversations(saved)
+            except Exception as e:
+                logger.error(f"Failed to update conversations for {len(saved)} chat messages: {str(e)}")
+    except asyncio.CancelledError:
+        unsaved = len(batch) + queue.qsize()
+        if unsaved:
+            logger.warning(f"Chat message writer stopped with {unsaved} unsaved messages")
+        raise
+
+
+async def _bump_conversations(batch):
+    """
+    Count the inserted messages on their conversations, as the REST
+    message endpoint does; one atomic UPDATE per conversation
+    """
+    now = timezone.now()
+    for conversation_id, count in Counter(message.conversation_id for message in batch).items():
+        await Conversation.objects.filter(pk=conversation_id).aupdate(
+            message_count=F('message_count') + count,
+            last_activity=now,
+            updated_at=now
+        )
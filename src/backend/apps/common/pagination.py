@@ -0,0 +1,57 @@
+from django.core.paginator import Page
+from django.db.models import Count, Window
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination
+
+TOTAL_ALIAS = '_page_total'
+
+
+class WindowCountPagination(PageNumberPagination):
+    """
+    Page number pagination that reads the total count off the page rows
+    with COUNT(*) OVER (), so a page costs one query instead of count + rows.
+    Works with model and values() querysets; responses match PageNumberPagination.
+    """
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+
+        page_number = request.query_params.get(self.page_query_param) or 1
+        if page_number in self.last_page_strings:
+            # The last page needs the count up front
+            return super().paginate_queryset(queryset, request, view)
+        try:
+            page_number = int(page_number)
+        except (TypeError, ValueError):
+            self._invalid_page(page_number, 'That page number is not an integer')
+        if page_number < 1:
+            self._invalid_page(page_number, 'That page number is less than 1')
+
+        offset = (page_number - 1) * page_size
+        rows = list(queryset.annotate(**{TOTAL_ALIAS: Window(Count('*'))})[offset:offset + page_size])
+
+        if rows:
+            first = rows[0]
+            total = first[TOTAL_ALIAS] if isinstance(first, dict) else getattr(first, TOTAL_ALIAS)
+            for row in rows:
+                if isinstance(row, dict):
+                    del row[TOTAL_ALIAS]
+        elif page_number == 1:
+            total = 0
+        else:
+            self._invalid_page(page_number, 'That page contains no results')
+
+        paginator = self.django_paginator_class(queryset, page_size)
+        paginator.count = total  # Already known; skips Paginator's COUNT query
+        self.page = Page(rows, page_number, paginator)
+
+        if paginator.num_pages > 1 and self.template is not None:
+            self.display_page_controls = True
+
+        return rows
+
+    def _invalid_page(self, page_number, message):
+        raise NotFound(self.invalid_page_message.format(page_number=page_number, message=message))
@@ -0,0 +1,15 @@
+import orjson
+from rest_framework.response import Response
+
+
+class ORJSONResponse(Response):
+    """
+    DRF Response that always renders its data as JSON with orjson,
+    bypassing renderer negotiation. Use for plain dict/list payloads.
+    """
+    @property
+    def rendered_content(self):
+        self['Content-Type'] = 'application/json'
+        if self.data is None:
+            return b''
+        return orjson.dumps(self.data)
@@ -0,0 +1,55 @@
+import copy
+import threading
+from django.utils import timezone
+from rest_framework import serializers
+
+
+def _copy_field(field):
+    """
+    Copy a cached field for a new serializer instance.
+    Leaf fields only need a shallow copy; fields that bind a nested child
+    (serializers, ListField, ManyRelatedField) are deep-copied so the child
+    is re-bound to the copy and picks up the right parent/context.
+    """
+    if isinstance(field, serializers.BaseSerializer) or hasattr(field, 'child') or hasattr(field, 'child_relation'):
+        return copy.deepcopy(field)
+    return copy.copy(field)
+
+
+def iso_datetime(value):
+    """Format a datetime the way DRF's DateTimeField renders it"""
+    if value is None:
+        return None
+    if timezone.is_aware(value):
+        value = timezone.localtime(value)
+    value = value.isoformat()
+    if value.endswith('+00:00'):
+        value = value[:-6] + 'Z'
+    return value
+
+
+class CachedFieldsMixin:
+    """
+    Build the serializer field set once per class instead of once per instance.
+    DRF rediscovers model fields on every instantiation, which dominates CPU
+    on list endpoints. The generated (unbound) fields are cached per class
+    and copied on access; DRF binds the copies to the instance as usual.
+    """
+    _fields_cache = {}
+    _fields_cache_lock = threading.Lock()
+
+    def get_fields(self):
+        cls = type(self)
+        cached = self._fields_cache.get(cls)
+        if cached is None:
+            with self._fields_cache_lock:
+                cached = self._fields_cache.get(cls)
+                if cached is None:
+                    cached = super().get_fields()
+                    self._fields_cache[cls] = cached
+        return {name: _copy_field(field) for name, field in cached.items()}
+
+
+class CachedModelSerializer(CachedFieldsMixin, serializers.ModelSerializer):
+    """ModelSerializer with per-class field caching"""
+    pass
@@ -0,0 +1,35 @@
+"""
+Dispatching Celery tasks with or without a worker
+Only deployments that start a worker set USE_CELERY_WORKER; elsewhere
+(start-backend.sh, runserver) tasks run in this process so their work
+isn't left sitting in the broker.
+"""
+import logging
+import threading
+from django.conf import settings
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue(task, *args, inline=False):
+    """
+    Queue task on the Celery worker, or without one run it here: right
+    away if inline, otherwise in a daemon thread
+    """
+    if settings.USE_CELERY_WORKER:
+        task.delay(*args)
+    elif inline:
+        task(*args)
+    else:
+        threading.Thread(target=_run_in_thread, args=(task, args), daemon=True).start()
+
+
+def _run_in_thread(task, args):
+    try:
+        task(*args)
+    except Exception:
+        logger.exception(f"Background task {task.name} failed")
+    finally:
+        # The thread's connection isn't cleaned up by a request cycle
+        close_old_connections()
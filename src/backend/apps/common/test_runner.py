@@ -0,0 +1,33 @@
+from django.apps import apps
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+class ModelSchemaTestRunner(DiscoverRunner):
+    """
+    Test runner that builds the test database straight from the models
+    Unmanaged tables come from init.sql and some migrations index them with
+    raw SQL, so migrations are skipped and every model is created as managed.
+    Caches are process-local so the suite doesn't need Redis.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._test_settings = override_settings(
+            MIGRATION_MODULES={config.label: None for config in apps.get_app_configs()},
+            CACHES={
+                alias: {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': alias}
+                for alias in settings.CACHES
+            }
+        )
+        self._test_settings.enable()
+        self._unmanaged_models = [model for model in apps.get_models() if not model._meta.managed]
+        for model in self._unmanaged_models:
+            model._meta.managed = True
+
+    def teardown_test_environment(self, **kwargs):
+        for model in self._unmanaged_models:
+            model._meta.managed = False
+        self._test_settings.disable()
+        super().teardown_test_environment(**kwargs)
@@ -0,0 +1,141 @@
+import threading
+from unittest import mock
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework import serializers
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from apps.rag.models import Document
+from .pagination import WindowCountPagination
+from .serializers import CachedModelSerializer
+from .tasks import enqueue
+
+
+factory = APIRequestFactory()
+
+
+class SmallPages(WindowCountPagination):
+    page_size = 2
+
+
+class SmallPlainPages(PageNumberPagination):
+    page_size = 2
+
+
+def _paginate(paginator, query, queryset):
+    request = Request(factory.get('/api/rag/documents/', query))
+    page = paginator.paginate_queryset(queryset, request)
+    return page, paginator.get_paginated_response(page).data
+
+
+class WindowCountPaginationTests(TestCase):
+    def setUp(self):
+        for i in range(5):
+            Document.objects.create(title=f'doc {i}', content='text')
+        self.queryset = Document.objects.order_by('id')
+
+    def test_page_matches_page_number_pagination(self):
+        for query in ({}, {'page': 2}, {'page': 3}, {'page': 'last'}):
+            with self.subTest(query=query):
+                _, expected = _paginate(SmallPlainPages(), query, self.queryset.values('id', 'title'))
+                _, data = _paginate(SmallPages(), query, self.queryset.values('id', 'title'))
+                self.assertEqual(data, expected)
+
+    def test_one_query_per_page(self):
+        with self.assertNumQueries(1):
+            page, data = _paginate(SmallPages(), {'page': 2}, self.queryset)
+        self.assertEqual(data['count'], 5)
+        self.assertEqual([document.title for document in page], ['doc 2', 'doc 3'])
+
+    def test_values_rows_drop_the_total(self):
+        page, _ = _paginate(SmallPages(), {}, self.queryset.values('id', 'title'))
+        self.assertEqual([sorted(row) for row in page], [['id', 'title'], ['id', 'title']])
+
+    def test_empty_first_page(self):
+        page, data = _paginate(SmallPages(), {}, Document.objects.none())
+        self.assertEqual(page, [])
+        self.assertEqual(data['count'], 0)
+        self.assertIsNone(data['next'])
+
+    def test_out_of_range_page(self):
+        with self.assertRaises(NotFound):
+            _paginate(SmallPages(), {'page': 4}, self.queryset)
+
+    def test_invalid_page_numbers(self):
+        for page_number in ('0', 'abc'):
+            with self.subTest(page=page_number), self.assertRaises(NotFound):
+                _paginate(SmallPages(), {'page': page_number}, self.queryset)
+
+
+class CachedFieldsMixinTests(TestCase):
+    def _serializer_class(self):
+        # A fresh class per test, so each starts with an empty field cache
+        class CachedDocumentSerializer(CachedModelSerializer):
+            class Meta:
+                model = Document
+                fields = ['id', 'title', 'metadata', 'created_at']
+
+        return CachedDocumentSerializer
+
+    def test_fields_built_once_per_class(self):
+        serializer_class = self._serializer_class()
+        with mock.patch.object(
+            serializers.ModelSerializer, 'get_fields', autospec=True,
+            side_effect=serializers.ModelSerializer.get_fields
+        ) as get_fields:
+            serializer_class().fields
+            serializer_class().fields
+        self.assertEqual(get_fields.call_count, 1)
+
+    def test_instances_get_their_own_bound_fields(self):
+        serializer_class = self._serializer_class()
+        first, second = serializer_class(), serializer_class()
+        self.assertIsNot(first.fields['title'], second.fields['title'])
+        self.assertIs(first.fields['title'].parent, first)
+        self.assertIs(second.fields['title'].parent, second)
+
+    def test_output_matches_model_serializer(self):
+        class PlainDocumentSerializer(serializers.ModelSerializer):
+            class Meta:
+                model = Document
+                fields = ['id', 'title', 'metadata', 'created_at']
+
+        document = Document.objects.create(title='doc', content='text', metadata={'a': 1})
+        serializer_class = self._serializer_class()
+        self.assertEqual(serializer_class(document).data, PlainDocumentSerializer(document).data)
+        self.assertEqual(serializer_class([document], many=True).data, PlainDocumentSerializer([document], many=True).data)
+
+
+@override_settings(USE_CELERY_WORKER=False)
+class EnqueueTests(SimpleTestCase):
+    def test_worker_gets_the_task(self):
+        task = mock.Mock()
+        with override_settings(USE_CELERY_WORKER=True):
+            enqueue(task, 1, 'a')
+        task.delay.assert_called_once_with(1, 'a')
+        task.assert_not_called()
+
+    def test_inline_without_worker(self):
+        task = mock.Mock()
+        enqueue(task, 1, 'a', inline=True)
+        task.assert_called_once_with(1, 'a')
+        task.delay.assert_not_called()
+
+    def test_thread_without_worker(self):
+        ran = threading.Event()
+        task = mock.Mock(side_effect=lambda *args: ran.set())
+        enqueue(task, 1, 'a')
+        self.assertTrue(ran.wait(5))
+        task.assert_called_once_with(1, 'a')
+        task.delay.assert_not_called()
+
+    def test_thread_failure_is_logged(self):
+        task = mock.Mock(side_effect=ValueError('boom'))
+        task.name = 'tests.failing'
+        with mock.patch('apps.common.tasks.threading.Thread') as thread, \
+                self.assertLogs('apps.common.tasks', 'ERROR') as logs:
+            enqueue(task, 1)
+            # Run the thread's target here instead
+            thread.call_args.kwargs['target'](*thread.call_args.kwargs['args'])
+        self.assertIn('tests.failing', logs.output[0])
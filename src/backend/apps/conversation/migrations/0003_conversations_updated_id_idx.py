@@ -0,0 +1,23 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ("conversation", "0002_alter_conversation_options"),
+    ]
+
+    operations = [
+        # conversations is unmanaged (schema owned by init.sql), so the index
+        # is created with raw SQL. Backs keyset pagination of the list in
+        # (updated_at, id) order.
+        migrations.RunSQL(
+            sql=(
+                "CREATE INDEX CONCURRENTLY IF NOT EXISTS conversations_updated_id "
+                "ON conversations (updated_at DESC, id DESC)"
+            ),
+            reverse_sql="DROP INDEX CONCURRENTLY IF EXISTS conversations_updated_id",
+        ),
+    ]
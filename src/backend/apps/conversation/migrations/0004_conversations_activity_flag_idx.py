@@ -0,0 +1,45 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ("conversation", "0003_conversations_updated_id_idx"),
+    ]
+
+    # conversations is unmanaged (schema owned by init.sql), so the indexes
+    # are created with raw SQL. last_activity/created_at back the stats
+    # Max/Min and activity ordering; the archived/starred flags are mostly
+    # false, so partial indexes keep those filters small.
+    operations = [
+        migrations.RunSQL(
+            sql=(
+                "CREATE INDEX CONCURRENTLY IF NOT EXISTS conversations_last_activity "
+                "ON conversations (last_activity DESC)"
+            ),
+            reverse_sql="DROP INDEX CONCURRENTLY IF EXISTS conversations_last_activity",
+        ),
+        migrations.RunSQL(
+            sql=(
+                "CREATE INDEX CONCURRENTLY IF NOT EXISTS conversations_created_at "
+                "ON conversations (created_at)"
+            ),
+            reverse_sql="DROP INDEX CONCURRENTLY IF EXISTS conversations_created_at",
+        ),
+        migrations.RunSQL(
+            sql=(
+                "CREATE INDEX CONCURRENTLY IF NOT EXISTS conversations_archived "
+                "ON conversations (id) WHERE is_archived"
+            ),
+            reverse_sql="DROP INDEX CONCURRENTLY IF EXISTS conversations_archived",
+        ),
+        migrations.RunSQL(
+            sql=(
+                "CREATE INDEX CONCURRENTLY IF NOT EXISTS conversations_starred "
+                "ON conversations (id) WHERE is_starred"
+            ),
+            reverse_sql="DROP INDEX CONCURRENTLY IF EXISTS conversations_starred",
+        ),
+    ]
@@ -20,6 +20,15 @@ class Conversation(models.Model):
         db_table = 'conversations'
         managed = False  # Don't let Django manage this table
         ordering = ['-updated_at']
+        # Created by init.sql / migrations 0003-0004; back keyset pagination
+        # of the list, activity ordering and the stats aggregates
+        indexes = [
+            models.Index(fields=['-updated_at', '-id'], name='conversations_updated_id'),
+            models.Index(fields=['-last_activity'], name='conversations_last_activity'),
+            models.Index(fields=['created_at'], name='conversations_created_at'),
+            models.Index(fields=['id'], condition=models.Q(is_archived=True), name='conversations_archived'),
+            models.Index(fields=['id'], condition=models.Q(is_starred=True), name='conversations_starred'),
+        ]
 
     def __str__(self):
         return f"{self.title or 'Untitled'} ({self.session_id})"
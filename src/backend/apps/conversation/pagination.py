@@ -0,0 +1,12 @@
+from rest_framework.pagination import CursorPagination
+
+
+class ConversationCursorPagination(CursorPagination):
+    """
+    Keyset pagination for the conversation list, newest activity first.
+    Deep pages are an index seek on (updated_at, id) instead of an OFFSET scan.
+    """
+    ordering = ('-updated_at', '-id')
+    page_size = 50
+    page_size_query_param = 'limit'
+    max_page_size = 500
@@ -1,8 +1,9 @@
 from rest_framework import serializers
+from apps.common.serializers import CachedModelSerializer, iso_datetime
 from .models import Conversation
 
 
-class ConversationSerializer(serializers.ModelSerializer):
+class ConversationSerializer(CachedModelSerializer):
     sessionId = serializers.CharField(source='session_id')
     messageCount = serializers.IntegerField(source='message_count', read_only=True)
     memorySummary = serializers.CharField(source='memory_summary', required=False, allow_blank=True, allow_null=True)
@@ -22,3 +23,27 @@ class ConversationSerializer(serializers.ModelSerializer):
             'isStarred', 'createdAt', 'updatedAt'
         ]
         read_only_fields = ['id', 'createdAt', 'updatedAt', 'messageCount', 'lastActivity']
+
+    def to_representation(self, instance):
+        # The declared fields only rename columns; build the output directly
+        # instead of running every field's get_attribute/to_representation.
+        # List querysets defer memory_summary and annotate a short preview
+        if hasattr(instance, 'memory_summary_preview'):
+            memory_summary = instance.memory_summary_preview
+        else:
+            memory_summary = instance.memory_summary
+
+        return {
+            'id': instance.id,
+            'sessionId': instance.session_id,
+            'title': instance.title,
+            'messageCount': instance.message_count,
+            'memorySummary': memory_summary,
+            'contextWindowSize': instance.context_window_size,
+            'lastActivity': iso_datetime(instance.last_activity),
+            'isArchived': instance.is_archived,
+            'projectId': instance.project_id,
+            'isStarred': instance.is_starred,
+            'createdAt': iso_datetime(instance.created_at),
+            'updatedAt': iso_datetime(instance.updated_at)
+        }
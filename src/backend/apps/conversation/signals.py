@@ -0,0 +1,10 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import Conversation
+from .stats import invalidate_stats
+
+
+@receiver([post_save, post_delete], sender=Conversation)
+def invalidate_stats_cache(sender, instance, **kwargs):
+    """Conversation created, archived or deleted; recompute the stats"""
+    invalidate_stats()
@@ -0,0 +1,36 @@
+"""
+Cached conversation statistics
+The counts change slowly, so they are shared through Django's cache for a
+short TTL and dropped whenever a conversation is saved or deleted
+"""
+from django.core.cache import cache
+from django.db.models import Count, Q, Min, Max
+from apps.chat.models import Message
+from .models import Conversation
+
+STATS_CACHE_KEY = 'conv:stats:v1'
+STATS_CACHE_TTL = 30
+
+
+def compute_stats():
+    """Compute conversation and message totals with two queries"""
+    stats = Conversation.objects.aggregate(
+        total=Count('id'),
+        active=Count('id', filter=Q(is_archived=False)),
+        archived=Count('id', filter=Q(is_archived=True)),
+        starred=Count('id', filter=Q(is_starred=True)),
+        most_recent=Max('last_activity'),
+        oldest=Min('created_at')
+    )
+    stats['messages'] = Message.objects.count()
+    return stats
+
+
+def get_stats():
+    """Get conversation statistics, computing them at most once per TTL"""
+    return cache.get_or_set(STATS_CACHE_KEY, compute_stats, STATS_CACHE_TTL)
+
+
+def invalidate_stats():
+    """Drop the cached statistics"""
+    cache.delete(STATS_CACHE_KEY)
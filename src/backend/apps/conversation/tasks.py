@@ -0,0 +1,88 @@
+"""
+Background tasks for conversations
+"""
+import logging
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from celery import shared_task
+from django.utils import timezone
+from apps.chat.llm import build_endpoint
+from apps.settings.models import UserSettings
+from .models import Conversation
+
+logger = logging.getLogger(__name__)
+
+# Shared across task invocations so the worker reuses TCP/TLS connections.
+# The title request is cheap to repeat, so transient upstream errors are retried
+_session = requests.Session()
+_session.mount('https://', HTTPAdapter(
+    pool_connections=10,
+    pool_maxsize=50,
+    max_retries=Retry(
+        total=2,
+        backoff_factor=0.2,
+        status_forcelist=[429, 502, 503, 504],
+        allowed_methods=frozenset(['POST']),
+        raise_on_status=False
+    )
+))
+
+
+def fallback_title(content):
+    """Build a title from the first sentence of a message"""
+    first_sentence = content.split('.')[0].split('?')[0].split('!')[0]
+    return first_sentence[:50].strip() + ('...' if len(first_sentence) > 50 else '')
+
+
+@shared_task(ignore_result=True)
+def generate_title(conversation_id, user_id, content, fallback):
+    """
+    Ask the user's model for a short conversation title and store it
+    The fallback title set by the view is kept if anything goes wrong,
+    and a title the user has changed since is left alone.
+    """
+    try:
+        settings = UserSettings.objects.only('api_key', 'base_url', 'model').get(user_id=user_id)
+    except UserSettings.DoesNotExist:
+        return
+
+    if not settings.api_key:
+        return
+
+    url, headers = build_endpoint(settings.base_url, settings.api_key)
+
+    # Request AI to generate a short title
+    payload = {
+        'model': settings.model or 'gpt-3.5-turbo',
+        'messages': [
+            {
+                'role': 'system',
+                'content': 'Generate a concise 3-6 word title for the following question or statement. Only return the title, nothing else.'
+            },
+            {
+                'role': 'user',
+                'content': content
+            }
+        ],
+        'max_tokens': 20,
+        'temperature': 0.5
+    }
+
+    try:
+        response = _session.post(url, headers=headers, json=payload, timeout=10)
+        if response.status_code != 200:
+            return
+
+        result = response.json()
+        if not result.get('choices'):
+            return
+
+        # Clean up title - remove quotes if present
+        ai_title = result['choices'][0]['message']['content'].strip().strip('"\'')
+    except Exception as e:
+        logger.warning(f"Title generation failed for conversation {conversation_id}: {e}")
+        return
+
+    if ai_title:
+        Conversation.objects.filter(pk=conversation_id, title=fallback).update(title=ai_title[:100], updated_at=timezone.now())
@@ -0,0 +1,202 @@
+from datetime import timedelta
+from unittest import mock
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+from apps.chat.models import Message
+from apps.settings.models import UserSettings
+from . import tasks
+from .models import Conversation
+
+
+LIST_URL = '/api/conversations/'
+
+
+class PruneTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.conversation = Conversation.objects.create(session_id='prune-me', title='Prune', message_count=7)
+        # Oldest first; the two newest are past keep_count
+        scores = [0.1, None, 0.0, 0.9, 0.2, 0.1, 0.1]
+        start = timezone.now() - timedelta(hours=1)
+        for i, score in enumerate(scores):
+            message = Message.objects.create(
+                conversation=self.conversation, role='user', content=f'message {i}', importance_score=score
+            )
+            Message.objects.filter(pk=message.pk).update(created_at=start + timedelta(minutes=i))
+
+    def _prune(self, **body):
+        return self.client.post('/api/conversations/prune-me/prune/', body, format='json')
+
+    def _remaining(self):
+        messages = Message.objects.filter(conversation=self.conversation).order_by('created_at')
+        return [message.content for message in messages]
+
+    def test_prunes_old_low_importance_messages(self):
+        response = self._prune(keep_count=2, min_importance=0.3)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'pruned_count': 2, 'remaining_count': 5, 'original_count': 7})
+        # Recent, important and unscored (NULL or 0) messages survive
+        self.assertEqual(self._remaining(), ['message 1', 'message 2', 'message 3', 'message 5', 'message 6'])
+        self.conversation.refresh_from_db()
+        self.assertEqual(self.conversation.message_count, 5)
+
+    def test_nothing_to_prune_within_keep_count(self):
+        response = self._prune(keep_count=10)
+        self.assertEqual(response.json(), {
+            'pruned_count': 0,
+            'remaining_count': 7,
+            'message': 'No messages to prune'
+        })
+        self.assertEqual(len(self._remaining()), 7)
+
+    def test_other_conversations_are_untouched(self):
+        other = Conversation.objects.create(session_id='other', title='Other')
+        Message.objects.create(conversation=other, role='user', content='old', importance_score=0.1)
+        self._prune(keep_count=0, min_importance=0.3)
+        self.assertEqual(Message.objects.filter(conversation=other).count(), 1)
+
+
+class ConversationCursorPaginationTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        now = timezone.now()
+        for i in range(5):
+            conversation = Conversation.objects.create(session_id=f'session-{i}', title=f'Conversation {i}')
+            # auto_now would overwrite updated_at on save
+            Conversation.objects.filter(pk=conversation.pk).update(updated_at=now - timedelta(minutes=i))
+        # Same updated_at as session-1; ties are broken by id
+        tied = Conversation.objects.create(session_id='session-tied', title='Tied')
+        Conversation.objects.filter(pk=tied.pk).update(updated_at=now - timedelta(minutes=1))
+
+    def _walk(self, url):
+        session_ids = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            data = response.json()
+            session_ids += [conversation['sessionId'] for conversation in data['conversations']]
+            url = data['pagination']['next']
+        return session_ids
+
+    def test_pages_follow_activity_order(self):
+        session_ids = self._walk(f'{LIST_URL}?cursor=&limit=2')
+        expected = list(
+            Conversation.objects.order_by('-updated_at', '-id').values_list('session_id', flat=True)
+        )
+        self.assertEqual(session_ids, expected)
+        self.assertEqual(session_ids[1:3], ['session-tied', 'session-1'])
+
+    def test_page_size_and_total(self):
+        data = self.client.get(f'{LIST_URL}?cursor=&limit=2').json()
+        self.assertEqual(len(data['conversations']), 2)
+        self.assertEqual(data['pagination']['limit'], 2)
+        self.assertEqual(data['pagination']['total'], 6)
+        self.assertIsNone(data['pagination']['previous'])
+        self.assertIsNotNone(data['pagination']['next'])
+
+    def test_previous_link_returns_to_the_first_page(self):
+        first = self.client.get(f'{LIST_URL}?cursor=&limit=2').json()
+        second = self.client.get(first['pagination']['next']).json()
+        back = self.client.get(second['pagination']['previous']).json()
+        self.assertEqual(back['conversations'], first['conversations'])
+
+    def test_offset_pagination_without_cursor(self):
+        data = self.client.get(f'{LIST_URL}?limit=2&offset=2').json()
+        self.assertEqual(data['pagination'], {'limit': 2, 'offset': 2, 'total': 6})
+        self.assertEqual(len(data['conversations']), 2)
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.conversation = Conversation.objects.create(session_id='etag', title='ETag')
+        Message.objects.create(conversation=self.conversation, role='user', content='Hi')
+
+    def _get(self, path, etag=None):
+        headers = {'HTTP_IF_NONE_MATCH': etag} if etag else {}
+        return self.client.get(f'/api/conversations/etag/{path}/', **headers)
+
+    def test_messages_not_modified(self):
+        first = self._get('messages')
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(first['Cache-Control'], 'private, max-age=5')
+        etag = first['ETag']
+
+        again = self._get('messages', etag)
+        self.assertEqual(again.status_code, 304)
+        self.assertEqual(again['ETag'], etag)
+        self.assertEqual(again.content, b'')
+
+    def test_new_message_changes_the_messages_etag(self):
+        etag = self._get('messages')['ETag']
+        # Written the way streamed replies are, without touching the conversation
+        Message.objects.create(conversation=self.conversation, role='assistant', content='Hello')
+        response = self._get('messages', etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(len(response.json()['messages']), 2)
+
+    def test_streamed_messages_carry_the_etag(self):
+        etag = self._get('messages')['ETag']
+        response = self.client.get('/api/conversations/etag/messages/?stream=1')
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(self.client.get('/api/conversations/etag/messages/?stream=1', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_summaries_not_modified_until_the_conversation_changes(self):
+        first = self._get('summaries')
+        self.assertEqual(first.status_code, 200)
+        etag = first['ETag']
+        self.assertEqual(self._get('summaries', etag).status_code, 304)
+
+        Conversation.objects.filter(pk=self.conversation.pk).update(
+            memory_summary='Talked about greetings', message_count=2, updated_at=timezone.now()
+        )
+        response = self._get('summaries', etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.json()['memory_summary'], 'Talked about greetings')
+
+
+class GenerateTitleTests(TestCase):
+    def setUp(self):
+        UserSettings.objects.create(user_id='title-user', api_key='key')
+        reply = mock.Mock(status_code=200)
+        reply.json.return_value = {'choices': [{'message': {'content': '"Greeting Ideas"'}}]}
+        patcher = mock.patch.object(tasks._session, 'post', return_value=reply)
+        self.post = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_replaces_the_fallback_title(self):
+        conversation = Conversation.objects.create(session_id='title-1', title='Hello there')
+        tasks.generate_title(conversation.id, 'title-user', 'Hello there. How are you?', 'Hello there')
+        conversation.refresh_from_db()
+        self.assertEqual(conversation.title, 'Greeting Ideas')
+
+    def test_keeps_a_title_renamed_meanwhile(self):
+        conversation = Conversation.objects.create(session_id='title-2', title='My own title')
+        tasks.generate_title(conversation.id, 'title-user', 'Hello there. How are you?', 'Hello there')
+        conversation.refresh_from_db()
+        self.assertEqual(conversation.title, 'My own title')
+
+    def test_keeps_the_fallback_on_upstream_errors(self):
+        self.post.return_value = mock.Mock(status_code=500)
+        conversation = Conversation.objects.create(session_id='title-3', title='Hello there')
+        tasks.generate_title(conversation.id, 'title-user', 'Hello there', 'Hello there')
+        conversation.refresh_from_db()
+        self.assertEqual(conversation.title, 'Hello there')
+
+    def test_first_user_message_is_titled(self):
+        client = APIClient()
+        with mock.patch('apps.conversation.views.enqueue') as enqueue:
+            response = client.post(
+                '/api/conversations/title-4/messages/',
+                {'role': 'user', 'content': 'Plan a trip to Kyoto. Two weeks', 'user_id': 'title-user'},
+                format='json'
+            )
+        self.assertEqual(response.status_code, 201)
+        conversation = Conversation.objects.get(session_id='title-4')
+        self.assertEqual((conversation.title, conversation.message_count), ('Plan a trip to Kyoto', 1))
+        enqueue.assert_called_once_with(
+            tasks.generate_title, conversation.id, 'title-user', 'Plan a trip to Kyoto. Two weeks', 'Plan a trip to Kyoto'
+        )
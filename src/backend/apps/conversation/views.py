@@ -2,13 +2,37 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny
-from django.core.cache import cache
+from django.core.cache import caches
+from django.http import StreamingHttpResponse
+from django.db.models import Count, Max, F
+from django.db.models.functions import Left
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
 from .models import Conversation
 from .serializers import ConversationSerializer
+from .pagination import ConversationCursorPagination
+from .stats import get_stats
+from .tasks import fallback_title, generate_title
 from apps.chat.models import Message
 from apps.chat.serializers import MessageSerializer
+from apps.chat.fast_serializers import serialize_messages, aiter_messages_json, MESSAGE_VALUES
+from apps.common.responses import ORJSONResponse
+from apps.common.tasks import enqueue
+import logging
 import time
 
+logger = logging.getLogger(__name__)
+
+# Characters of memory_summary returned per conversation by list()
+SUMMARY_PREVIEW_LENGTH = 300
+
+
+def _with_etag(response, etag):
+    """Tag a response so clients can revalidate it with If-None-Match"""
+    response['ETag'] = etag
+    patch_cache_control(response, private=True, max_age=5)
+    return response
+
 
 class ConversationViewSet(viewsets.ModelViewSet):
     permission_classes = [AllowAny]
@@ -16,6 +40,16 @@ class ConversationViewSet(viewsets.ModelViewSet):
     queryset = Conversation.objects.all()
     lookup_field = 'session_id'  # Allow lookup by session_id instead of pk
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action == 'list':
+            # The sidebar only shows a clamped preview of the summary, so skip
+            # loading the full TEXT column for every listed conversation
+            queryset = queryset.defer('memory_summary').annotate(
+                memory_summary_preview=Left('memory_summary', SUMMARY_PREVIEW_LENGTH)
+            )
+        return queryset
+
     def list(self, request):
         """
         GET /api/conversations/
@@ -24,28 +58,44 @@ class ConversationViewSet(viewsets.ModelViewSet):
         limit = int(request.query_params.get('limit', 50))
         offset = int(request.query_params.get('offset', 0))
 
-        # Get conversations
+        # Get stats, cached briefly since they change slowly
+        conversation_stats = get_stats()
+        total_conversations = conversation_stats['total']
+        active_conversations = conversation_stats['active']
+        archived_conversations = conversation_stats['archived']
+        total_messages = conversation_stats['messages']
+        avg_messages = total_messages / total_conversations if total_conversations > 0 else 0
+
+        # Get conversations; the list is unfiltered, so its total is the
+        # conversation count from the aggregate above
         queryset = self.filter_queryset(self.get_queryset())
-        total = queryset.count()
-        conversations = queryset[offset:offset + limit]
+        total = total_conversations
+
+        if 'cursor' in request.query_params:
+            # Keyset pagination; an empty cursor starts at the first page
+            paginator = ConversationCursorPagination()
+            conversations = paginator.paginate_queryset(queryset, request, view=self)
+            pagination = {
+                'limit': paginator.page_size,
+                'offset': None,
+                'total': total,
+                'next': paginator.get_next_link(),
+                'previous': paginator.get_previous_link()
+            }
+        else:
+            conversations = queryset[offset:offset + limit]
+            pagination = {
+                'limit': limit,
+                'offset': offset,
+                'total': total
+            }
 
         # Serialize conversations
         serializer = self.get_serializer(conversations, many=True)
 
-        # Get stats
-        total_conversations = Conversation.objects.count()
-        active_conversations = Conversation.objects.filter(is_archived=False).count()
-        archived_conversations = Conversation.objects.filter(is_archived=True).count()
-        total_messages = Message.objects.count()
-        avg_messages = total_messages / total_conversations if total_conversations > 0 else 0
-
         return Response({
             'conversations': serializer.data,
-            'pagination': {
-                'limit': limit,
-                'offset': offset,
-                'total': total
-            },
+            'pagination': pagination,
             'stats': {
                 'totalConversations': total_conversations,
                 'activeConversations': active_conversations,
@@ -101,8 +151,24 @@ class ConversationViewSet(viewsets.ModelViewSet):
         if request.method == 'GET':
             conversation = self.get_object()
             messages = Message.objects.filter(conversation_id=conversation.id).order_by('created_at')
-            serializer = MessageSerializer(messages, many=True)
-            return Response({'messages': serializer.data}, status=status.HTTP_200_OK)
+
+            # Streamed replies are written without touching the conversation
+            # row, so version the history by its own count and newest id
+            history = messages.aggregate(count=Count('id'), last_id=Max('id'))
+            etag = f'"{history["count"]}-{history["last_id"] or 0}"'
+            not_modified = get_conditional_response(request, etag=etag)
+            if not_modified is not None:
+                return _with_etag(not_modified, etag)
+
+            if request.query_params.get('stream') in ('1', 'true'):
+                # Long conversations: stream rows instead of loading them all
+                return _with_etag(StreamingHttpResponse(
+                    aiter_messages_json(messages.values(*MESSAGE_VALUES)),
+                    content_type='application/json'
+                ), etag)
+
+            rows = messages.values(*MESSAGE_VALUES)
+            return _with_etag(ORJSONResponse({'messages': serialize_messages(rows)}, status=status.HTTP_200_OK), etag)
 
         elif request.method == 'POST':
             # Try to get the conversation, create if it doesn't exist
@@ -127,85 +193,29 @@ class ConversationViewSet(viewsets.ModelViewSet):
 
             serializer.save()
 
-            # Update conversation's last_activity and message count
-            conversation.message_count = Message.objects.filter(conversation_id=conversation.id).count()
-
-            # Generate title from first user message using AI
-            if conversation_created and data.get('role') == 'user':
-                content = data.get('content', '')
-                if content:
-                    # Generate a title using AI
-                    from apps.settings.models import UserSettings
-                    import requests
-                    import os
-
-                    try:
-                        # Get user settings for API key
-                        user_id = request.data.get('user_id', 'default_user')
-                        settings = UserSettings.objects.get(user_id=user_id)
-
-                        if settings.api_key:
-                            base_url = settings.base_url or os.getenv('OPENAI_API_BASE', 'https://api.openai.com/v1')
-                            base_url = base_url.rstrip('/')
-                            if not base_url.endswith('/v1'):
-                                base_url = f"{base_url}/v1"
-
-                            headers = {
-                                'Authorization': f'Bearer {settings.api_key}',
-                                'Content-Type': 'application/json'
-                            }
-
-                            if 'openrouter.ai' in base_url.lower():
-                                headers['HTTP-Referer'] = os.getenv('OPENROUTER_REFERER', 'http://localhost:20001')
-                                headers['X-Title'] = os.getenv('OPENROUTER_APP_NAME', 'Mini Chatbox')
-
-                            # Request AI to generate a short title
-                            payload = {
-                                'model': settings.model or 'gpt-3.5-turbo',
-                                'messages': [
-                                    {
-                                        'role': 'system',
-                                        'content': 'Generate a concise 3-6 word title for the following question or statement. Only return the title, nothing else.'
-                                    },
-                                    {
-                                        'role': 'user',
-                                        'content': content[:500]  # Limit to first 500 chars
-                                    }
-                                ],
-                                'max_tokens': 20,
-                                'temperature': 0.5
-                            }
-
-                            response = requests.post(
-                                f"{base_url}/chat/completions",
-                                headers=headers,
-                                json=payload,
-                                timeout=10
-                            )
-
-                            if response.status_code == 200:
-                                result = response.json()
-                                if result.get('choices') and len(result['choices']) > 0:
-                                    ai_title = result['choices'][0]['message']['content'].strip()
-                                    # Clean up title - remove quotes if present
-                                    ai_title = ai_title.strip('"\'')
-
-                                    if ai_title:  # Only use if not empty
-                                        conversation.title = ai_title[:100]  # Limit to 100 chars
-                                    else:
-                                        # If AI returned empty, use fallback
-                                        first_sentence = content.split('.')[0].split('?')[0].split('!')[0]
-                                        conversation.title = first_sentence[:50].strip() + ('...' if len(first_sentence) > 50 else '')
-                            else:
-                                # Fall back to extracting from content
-                                first_sentence = content.split('.')[0].split('?')[0].split('!')[0]
-                                conversation.title = first_sentence[:50].strip() + ('...' if len(first_sentence) > 50 else '')
-                    except Exception as e:
-                        # If AI title generation fails, fall back to extracting from content
-                        first_sentence = content.split('.')[0].split('?')[0].split('!')[0]
-                        conversation.title = first_sentence[:50].strip() + ('...' if len(first_sentence) > 50 else '')
-
-            conversation.save()
+            # Title the conversation from the first user message right away;
+            # the AI title replaces it in the background
+            updates = {}
+            content = data.get('content', '')
+            if conversation_created and data.get('role') == 'user' and content:
+                updates['title'] = conversation.title = fallback_title(content)
+
+            # Update conversation's last_activity, message count and title in
+            # one statement; an atomic increment instead of re-counting
+            now = timezone.now()
+            Conversation.objects.filter(pk=conversation.id).update(
+                message_count=F('message_count') + 1,
+                last_activity=now,
+                updated_at=now,
+                **updates
+            )
+
+            if 'title' in updates:
+                user_id = request.data.get('user_id', 'default_user')
+                try:
+                    enqueue(generate_title, conversation.id, user_id, content[:500], updates['title'])
+                except Exception as e:
+                    logger.warning(f"Could not queue title generation: {e}")
 
             return Response(serializer.data, status=status.HTTP_201_CREATED)
 
@@ -217,6 +227,14 @@ class ConversationViewSet(viewsets.ModelViewSet):
         """
         conversation = self.get_object()
 
+        etag = (
+            f'"{conversation.message_count}-{conversation.updated_at.timestamp()}'
+            f'-{conversation.last_activity.timestamp()}"'
+        )
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            return _with_etag(not_modified, etag)
+
         summaries = {
             'conversation_id': conversation.id,
             'title': conversation.title,
@@ -235,9 +253,9 @@ class ConversationViewSet(viewsets.ModelViewSet):
             ]
         }
 
-        return Response(summaries, status=status.HTTP_200_OK)
+        return _with_etag(Response(summaries, status=status.HTTP_200_OK), etag)
 
-    @action(detail=True, methods=['post'], url_path='summaries')
+    @summaries.mapping.post
     def create_summary(self, request, session_id=None):
         """
         POST /api/conversations/{session_id}/summaries/
@@ -250,7 +268,7 @@ class ConversationViewSet(viewsets.ModelViewSet):
 
         # Update the conversation's memory_summary
         conversation.memory_summary = summary_content
-        conversation.save()
+        conversation.save(update_fields=['memory_summary', 'updated_at', 'last_activity'])
 
         summary_data = {
             'id': int(time.time()),
@@ -286,19 +304,21 @@ class ConversationViewSet(viewsets.ModelViewSet):
             }, status=status.HTTP_200_OK)
 
         # Keep the most recent messages and high importance messages
-        messages_to_keep = all_messages[:keep_count]
-        messages_to_check = all_messages[keep_count:]
-
-        # Filter out low importance messages
-        pruned_count = 0
-        for message in messages_to_check:
-            if message.importance_score and message.importance_score < min_importance:
-                message.delete()
-                pruned_count += 1
+        keep_ids = list(all_messages.values_list('id', flat=True)[:keep_count])
+
+        # Delete the low importance messages past the horizon in one statement;
+        # unscored (NULL or 0) messages are kept
+        pruned_count, _ = (
+            Message.objects.filter(conversation_id=conversation.id)
+            .exclude(id__in=keep_ids)
+            .filter(importance_score__lt=min_importance, importance_score__isnull=False)
+            .exclude(importance_score=0)
+            .delete()
+        )
 
         # Update conversation message count
-        conversation.message_count = Message.objects.filter(conversation_id=conversation.id).count()
-        conversation.save()
+        conversation.message_count = total_messages - pruned_count
+        Conversation.objects.filter(pk=conversation.id).update(message_count=conversation.message_count)
 
         return Response({
             'pruned_count': pruned_count,
@@ -312,7 +332,7 @@ class ConversationViewSet(viewsets.ModelViewSet):
         GET /api/conversations/cache/{key}/
         Get cached data
         """
-        cached_data = cache.get(f'conversation:{cache_key}')
+        cached_data = caches['conversation'].get(f'conversation:{cache_key}')
 
         if cached_data is None:
             return Response({
@@ -327,7 +347,7 @@ class ConversationViewSet(viewsets.ModelViewSet):
             'data': cached_data
         }, status=status.HTTP_200_OK)
 
-    @action(detail=False, methods=['post'], url_path='cache/(?P<cache_key>[^/.]+)')
+    @get_cache.mapping.post
     def set_cache(self, request, cache_key=None):
         """
         POST /api/conversations/cache/{key}/
@@ -336,7 +356,7 @@ class ConversationViewSet(viewsets.ModelViewSet):
         data = request.data.get('data')
         ttl = request.data.get('ttl', 3600)  # Default 1 hour
 
-        cache.set(f'conversation:{cache_key}', data, ttl)
+        caches['conversation'].set(f'conversation:{cache_key}', data, ttl)
 
         return Response({
             'key': cache_key,
@@ -344,18 +364,59 @@ class ConversationViewSet(viewsets.ModelViewSet):
             'ttl': ttl
         }, status=status.HTTP_201_CREATED)
 
+    @action(detail=False, methods=['post'], url_path='cache-bulk/get')
+    def get_cache_bulk(self, request):
+        """
+        POST /api/conversations/cache-bulk/get/
+        Get several cached entries in one round trip
+        """
+        keys = request.data.get('keys')
+        if not isinstance(keys, list):
+            return Response({'error': 'keys must be a list'}, status=status.HTTP_400_BAD_REQUEST)
+
+        found = caches['conversation'].get_many([f'conversation:{key}' for key in keys])
+        prefix_len = len('conversation:')
+
+        return Response({
+            'entries': {key[prefix_len:]: data for key, data in found.items()},
+            'missing': [key for key in keys if f'conversation:{key}' not in found]
+        }, status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=['post'], url_path='cache-bulk/set')
+    def set_cache_bulk(self, request):
+        """
+        POST /api/conversations/cache-bulk/set/
+        Set several cached entries in one round trip
+        """
+        entries = request.data.get('entries')
+        ttl = request.data.get('ttl', 3600)  # Default 1 hour
+        if not isinstance(entries, dict):
+            return Response({'error': 'entries must be an object'}, status=status.HTTP_400_BAD_REQUEST)
+
+        caches['conversation'].set_many(
+            {f'conversation:{key}': data for key, data in entries.items()},
+            ttl
+        )
+
+        return Response({
+            'keys': list(entries),
+            'success': True,
+            'ttl': ttl
+        }, status=status.HTTP_201_CREATED)
+
     @action(detail=False, methods=['get'])
     def stats(self, request):
         """
         GET /api/conversations/stats/
         Get conversation statistics
         """
-        total_conversations = Conversation.objects.count()
-        active_conversations = Conversation.objects.filter(is_archived=False).count()
-        archived_conversations = Conversation.objects.filter(is_archived=True).count()
-        starred_conversations = Conversation.objects.filter(is_starred=True).count()
+        conversation_stats = get_stats()
+        total_conversations = conversation_stats['total']
+        active_conversations = conversation_stats['active']
+        archived_conversations = conversation_stats['archived']
+        starred_conversations = conversation_stats['starred']
 
-        total_messages = Message.objects.count()
+        total_messages = conversation_stats['messages']
 
         # Calculate average messages per conversation
         avg_messages = total_messages / total_conversations if total_conversations > 0 else 0
@@ -372,8 +433,8 @@ class ConversationViewSet(viewsets.ModelViewSet):
                 'average_per_conversation': round(avg_messages, 2)
             },
             'activity': {
-                'most_recent': Conversation.objects.order_by('-last_activity').first().last_activity if total_conversations > 0 else None,
-                'oldest': Conversation.objects.order_by('created_at').first().created_at if total_conversations > 0 else None
+                'most_recent': conversation_stats['most_recent'],
+                'oldest': conversation_stats['oldest']
             }
         }
 
@@ -18,5 +18,6 @@ class MCPServerAdmin(admin.ModelAdmin):
 @admin.register(MCPTool)
 class MCPToolAdmin(admin.ModelAdmin):
     list_display = ['id', 'name', 'server', 'is_enabled', 'created_at']
+    list_select_related = ['server']
     list_filter = ['is_enabled', 'server', 'created_at']
     search_fields = ['name', 'description']
@@ -0,0 +1,57 @@
+"""
+Read-only serializers for MCP list endpoints
+Build the same payload as the DRF serializers straight from values() rows.
+"""
+from collections import defaultdict
+from apps.common.serializers import iso_datetime
+from .models import MCPTool
+
+TOOL_VALUES = ('id', 'name', 'description', 'parameters', 'is_enabled', 'created_at')
+SERVER_VALUES = ('id', 'name', 'url', 'is_active', 'tool_count', 'metadata', 'created_at', 'updated_at')
+
+
+def serialize_tools(rows):
+    """Serialize MCPTool.values(*TOOL_VALUES) rows"""
+    return [
+        {
+            'id': r['id'],
+            'name': r['name'],
+            'description': r['description'],
+            'parameters': r['parameters'],
+            'is_enabled': r['is_enabled'],
+            'created_at': iso_datetime(r['created_at'])
+        }
+        for r in rows
+    ]
+
+
+def serialize_servers(rows):
+    """
+    Serialize MCPServer.values(*SERVER_VALUES) rows with their nested tools
+    Tools for all servers are fetched in a single query
+    """
+    rows = list(rows)
+    tools_by_server = defaultdict(list)
+    if rows:
+        tool_rows = (
+            MCPTool.objects
+            .filter(server_id__in=[r['id'] for r in rows])
+            .values('server_id', *TOOL_VALUES)
+        )
+        for tool in tool_rows:
+            tools_by_server[tool['server_id']].append(tool)
+
+    return [
+        {
+            'id': r['id'],
+            'name': r['name'],
+            'url': r['url'],
+            'is_active': r['is_active'],
+            'tool_count': r['tool_count'],
+            'tools': serialize_tools(tools_by_server[r['id']]),
+            'metadata': r['metadata'],
+            'created_at': iso_datetime(r['created_at']),
+            'updated_at': iso_datetime(r['updated_at'])
+        }
+        for r in rows
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.1.4 on 2026-10-15 02:10
+
+from django.db import migrations
+from django.db.models import Count, Max
+
+
+def remove_duplicate_tools(apps, schema_editor):
+    # Keep the newest tool for each (server, name) so the constraint can be added
+    MCPTool = apps.get_model("mcp", "MCPTool")
+    duplicates = (
+        MCPTool.objects.values("server_id", "name")
+        .annotate(rows=Count("id"), newest=Max("id"))
+        .filter(rows__gt=1)
+    )
+    for duplicate in duplicates:
+        MCPTool.objects.filter(server_id=duplicate["server_id"], name=duplicate["name"]).exclude(
+            pk=duplicate["newest"]
+        ).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("mcp", "0002_alter_mcpserver_id_alter_mcptool_id"),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_tools, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name="mcptool",
+            unique_together={("server", "name")},
+        ),
+    ]
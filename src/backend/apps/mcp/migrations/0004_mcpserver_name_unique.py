@@ -0,0 +1,33 @@
+# Generated by Django 5.1.4 on 2026-10-15 02:14
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def rename_duplicate_servers(apps, schema_editor):
+    # Servers are looked up by name, so the newest keeps it; older ones are
+    # renamed "<name> (<id>)" rather than deleted along with their tools
+    MCPServer = apps.get_model("mcp", "MCPServer")
+    duplicates = MCPServer.objects.values("name").annotate(rows=Count("id")).filter(rows__gt=1)
+    for duplicate in duplicates:
+        servers = MCPServer.objects.filter(name=duplicate["name"]).order_by("-id")
+        for server in list(servers)[1:]:
+            suffix = f" ({server.id})"
+            server.name = server.name[:255 - len(suffix)] + suffix
+            server.save(update_fields=["name"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("mcp", "0003_mcptool_server_name_unique"),
+    ]
+
+    operations = [
+        migrations.RunPython(rename_duplicate_servers, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name="mcpserver",
+            name="name",
+            field=models.CharField(max_length=255, unique=True),
+        ),
+    ]
@@ -1,11 +1,13 @@
 from django.db import models
+from django.utils.functional import cached_property
 
 
 # MCP tables don't exist in Node.js backend yet
 # These are new tables for Python backend only
 class MCPServer(models.Model):
     id = models.AutoField(primary_key=True)
-    name = models.CharField(max_length=255)
+    # The viewset looks servers up by name
+    name = models.CharField(max_length=255, unique=True)
     url = models.CharField(max_length=500)
     api_key = models.CharField(max_length=500, blank=True)
     is_active = models.BooleanField(default=True)
@@ -33,6 +35,12 @@ class MCPTool(models.Model):
     class Meta:
         db_table = 'mcp_tools'
         ordering = ['name']
+        # Conflict target for the bulk upsert in sync_tools
+        unique_together = (('server', 'name'),)
+
+    @cached_property
+    def server_name(self):
+        return self.server.name
 
     def __str__(self):
-        return f"{self.server.name}::{self.name}"
+        return f"{self.server_name}::{self.name}"
@@ -1,17 +1,18 @@
 from rest_framework import serializers
+from apps.common.serializers import CachedModelSerializer
 from .models import MCPServer, MCPTool
 
 
-class MCPToolSerializer(serializers.ModelSerializer):
+class MCPToolSerializer(CachedModelSerializer):
     class Meta:
         model = MCPTool
         fields = ['id', 'name', 'description', 'parameters', 'is_enabled', 'created_at']
         read_only_fields = ['id', 'created_at']
 
 
-class MCPServerSerializer(serializers.ModelSerializer):
+class MCPServerSerializer(CachedModelSerializer):
     tools = MCPToolSerializer(many=True, read_only=True)
-    tool_count = serializers.SerializerMethodField()
+    tool_count = serializers.IntegerField(read_only=True, default=0)
     serverId = serializers.CharField(write_only=True, required=False)
     config = serializers.JSONField(write_only=True, required=False)
 
@@ -20,9 +21,6 @@ class MCPServerSerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'url', 'is_active', 'tool_count', 'tools', 'metadata', 'serverId', 'config', 'created_at', 'updated_at']
         read_only_fields = ['id', 'created_at', 'updated_at']
 
-    def get_tool_count(self, obj):
-        return obj.tools.count()
-
     def create(self, validated_data):
         # Handle frontend format with serverId and config
         server_id = validated_data.pop('serverId', None)
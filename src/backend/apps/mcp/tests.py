@@ -0,0 +1,40 @@
+from django.test import TestCase
+from rest_framework.test import APIClient
+from .models import MCPServer, MCPTool
+
+
+class SyncToolsTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.server = MCPServer.objects.create(name='files', url='http://mcp.example')
+
+    def _sync(self):
+        return self.client.post('/api/mcp/servers/files/sync_tools/')
+
+    def test_creates_the_tools(self):
+        response = self._sync()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['synced_count'], 3)
+        self.assertEqual(
+            list(MCPTool.objects.filter(server=self.server).values_list('name', flat=True)),
+            ['tool_1', 'tool_2', 'tool_3']
+        )
+
+    def test_resync_updates_instead_of_duplicating(self):
+        existing = MCPTool.objects.create(
+            server=self.server, name='tool_1', description='stale', parameters={}, is_enabled=False
+        )
+        self._sync()
+        self._sync()
+
+        self.assertEqual(MCPTool.objects.filter(server=self.server).count(), 3)
+        existing.refresh_from_db()
+        self.assertEqual(existing.description, 'Mock tool 1 from files')
+        self.assertEqual(existing.parameters['properties'], {'input': {'type': 'string'}})
+        self.assertTrue(existing.is_enabled)
+
+    def test_other_servers_keep_their_tools(self):
+        other = MCPServer.objects.create(name='search', url='http://search.example')
+        MCPTool.objects.create(server=other, name='tool_1', description='search tool')
+        self._sync()
+        self.assertEqual(MCPTool.objects.get(server=other).description, 'search tool')
@@ -2,16 +2,50 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny
+from django.db.models import Count
 from .models import MCPServer, MCPTool
-from .serializers import (
-    MCPServerSerializer, MCPToolSerializer,
-    MCPResourceSerializer, MCPPromptSerializer
-)
+from .serializers import MCPServerSerializer, MCPToolSerializer
+from .fast_serializers import serialize_servers, serialize_tools, SERVER_VALUES, TOOL_VALUES
 import time
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Server-independent parts of the mock sync/resources/prompts payloads,
+# built once; the views only fill in the per-server fields
+_TOOL_NAMES = tuple((i, f'tool_{i}') for i in range(1, 4))
+_TOOL_PARAMETERS = {
+    'type': 'object',
+    'properties': {
+        'input': {'type': 'string'}
+    }
+}
+
+_RESOURCE_TEMPLATES = tuple(
+    (i, {
+        'id': f'resource_{i}',
+        'name': f'Resource {i}',
+        'type': 'file' if i % 2 == 0 else 'database'
+    })
+    for i in range(1, 6)
+)
+
+_PROMPT_TEMPLATES = tuple(
+    (i, {
+        'id': f'prompt_{i}',
+        'name': f'Prompt Template {i}',
+        'template': f'This is a template for prompt {i}: {{input}}',
+        'parameters': {
+            'input': {
+                'type': 'string',
+                'description': 'User input',
+                'required': True
+            }
+        }
+    })
+    for i in range(1, 4)
+)
+
 
 class MCPServerViewSet(viewsets.ModelViewSet):
     permission_classes = [AllowAny]
@@ -19,6 +53,24 @@ class MCPServerViewSet(viewsets.ModelViewSet):
     queryset = MCPServer.objects.all()
     lookup_field = 'name'  # Allow lookup by name instead of ID
 
+    def get_queryset(self):
+        # Annotate tool_count and prefetch the nested tools so serializing
+        # a list of servers doesn't issue a COUNT and a SELECT per server
+        return (
+            MCPServer.objects
+            .prefetch_related('tools')
+            .annotate(tool_count=Count('tools', distinct=True))
+            .order_by('name')
+        )
+
+    def list(self, request, *args, **kwargs):
+        """List servers with their tools, serialized from values() rows"""
+        queryset = self.filter_queryset(self.get_queryset()).prefetch_related(None).values(*SERVER_VALUES)
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(serialize_servers(page))
+        return Response(serialize_servers(queryset))
+
     def create(self, request, *args, **kwargs):
         """Override create to add logging"""
         logger.info(f"Creating MCP server with data: {request.data}")
@@ -38,29 +90,29 @@ class MCPServerViewSet(viewsets.ModelViewSet):
         # Mock tool sync - in production, this would connect to the MCP server
         synced_tools = [
             {
-                'name': f'tool_{i}',
+                'name': name,
                 'description': f'Mock tool {i} from {server.name}',
-                'parameters': {
-                    'type': 'object',
-                    'properties': {
-                        'input': {'type': 'string'}
-                    }
-                }
+                'parameters': _TOOL_PARAMETERS
             }
-            for i in range(1, 4)
+            for i, name in _TOOL_NAMES
         ]
 
-        # Create or update tools
-        for tool_data in synced_tools:
-            MCPTool.objects.update_or_create(
-                server=server,
-                name=tool_data['name'],
-                defaults={
-                    'description': tool_data['description'],
-                    'parameters': tool_data['parameters'],
-                    'is_enabled': True
-                }
-            )
+        # Create or update tools in one INSERT ... ON CONFLICT
+        MCPTool.objects.bulk_create(
+            [
+                MCPTool(
+                    server=server,
+                    name=tool_data['name'],
+                    description=tool_data['description'],
+                    parameters=tool_data['parameters'],
+                    is_enabled=True
+                )
+                for tool_data in synced_tools
+            ],
+            update_conflicts=True,
+            update_fields=['description', 'parameters', 'is_enabled'],
+            unique_fields=['server', 'name']
+        )
 
         return Response({
             'server_id': server.id,
@@ -77,10 +129,9 @@ class MCPServerViewSet(viewsets.ModelViewSet):
         """
         try:
             server = self.get_object()
-            tools = server.tools.all()
-            serializer = MCPToolSerializer(tools, many=True)
+            tools = MCPTool.objects.filter(server=server).values(*TOOL_VALUES)
             # Return in a format compatible with frontend expectations
-            return Response(serializer.data, status=status.HTTP_200_OK)
+            return Response(serialize_tools(tools), status=status.HTTP_200_OK)
         except MCPServer.DoesNotExist:
             return Response({
                 'error': f'MCP server "{name}" not found',
@@ -96,25 +147,22 @@ class MCPServerViewSet(viewsets.ModelViewSet):
         server = self.get_object()
 
         # Mock resources - in production, this would query the MCP server
+        now = time.time()
         resources = [
             {
-                'id': f'resource_{i}',
-                'name': f'Resource {i}',
-                'type': 'file' if i % 2 == 0 else 'database',
+                **template,
                 'uri': f'mcp://{server.name}/resources/{i}',
                 'description': f'Mock resource {i} from {server.name}',
                 'metadata': {
                     'server_id': server.id,
-                    'created_at': time.time()
+                    'created_at': now
                 }
             }
-            for i in range(1, 6)
+            for i, template in _RESOURCE_TEMPLATES
         ]
 
-        serializer = MCPResourceSerializer(resources, many=True)
-
-        # Return in a format compatible with frontend expectations
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        # Plain dicts already in the response shape; no serializer pass needed
+        return Response(resources, status=status.HTTP_200_OK)
 
     @action(detail=True, methods=['get'])
     def prompts(self, request, name=None):
@@ -127,31 +175,29 @@ class MCPServerViewSet(viewsets.ModelViewSet):
         # Mock prompts - in production, this would query the MCP server
         prompts = [
             {
-                'id': f'prompt_{i}',
-                'name': f'Prompt Template {i}',
-                'description': f'Mock prompt template {i} from {server.name}',
-                'template': f'This is a template for prompt {i}: {{input}}',
-                'parameters': {
-                    'input': {
-                        'type': 'string',
-                        'description': 'User input',
-                        'required': True
-                    }
-                }
+                **template,
+                'description': f'Mock prompt template {i} from {server.name}'
             }
-            for i in range(1, 4)
+            for i, template in _PROMPT_TEMPLATES
         ]
 
-        serializer = MCPPromptSerializer(prompts, many=True)
-
-        # Return in a format compatible with frontend expectations
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        # Plain dicts already in the response shape; no serializer pass needed
+        return Response(prompts, status=status.HTTP_200_OK)
 
 
 class MCPToolViewSet(viewsets.ReadOnlyModelViewSet):
     permission_classes = [AllowAny]
     serializer_class = MCPToolSerializer
-    queryset = MCPTool.objects.all()
+    # execute() reads tool.server_name; fetch the server in the same query
+    queryset = MCPTool.objects.select_related('server')
+
+    def list(self, request, *args, **kwargs):
+        """List tools, serialized from values() rows"""
+        queryset = self.filter_queryset(self.get_queryset()).values(*TOOL_VALUES)
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(serialize_tools(page))
+        return Response(serialize_tools(queryset))
 
     @action(detail=True, methods=['post'])
     def execute(self, request, pk=None):
@@ -165,7 +211,7 @@ class MCPToolViewSet(viewsets.ReadOnlyModelViewSet):
         execution_result = {
             'tool_id': tool.id,
             'tool_name': tool.name,
-            'server_name': tool.server.name,
+            'server_name': tool.server_name,
             'parameters': parameters,
             'result': f'Mock execution result for {tool.name} with params: {parameters}',
             'status': 'success',
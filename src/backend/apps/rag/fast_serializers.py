@@ -0,0 +1,48 @@
+"""
+Read-only serializers for RAG list endpoints
+Build the same payload as the DRF serializers straight from values() rows.
+"""
+from apps.common.serializers import iso_datetime
+
+DOCUMENT_VALUES = (
+    'id', 'title', 'content', 'file_path', 'file_type', 'file_size',
+    'metadata', 'knowledge_source_id', 'created_at', 'updated_at'
+)
+KNOWLEDGE_SOURCE_VALUES = (
+    'id', 'name', 'description', 'source_type', 'config', 'is_active',
+    'document_count', 'created_at', 'updated_at'
+)
+
+DATETIME_FIELDS = frozenset(('created_at', 'updated_at'))
+
+
+def requested_fields(request, available):
+    """
+    Get the fields picked with ?fields=a,b, in declared order
+    Unknown names are ignored; returns all fields if none are picked.
+    """
+    param = request.query_params.get('fields')
+    if not param:
+        return available
+    wanted = {name.strip() for name in param.split(',')}
+    return tuple(field for field in available if field in wanted) or available
+
+
+def _serialize_rows(rows, fields):
+    # Output keys match the column names, so only datetimes need converting
+    datetime_fields = [field for field in fields if field in DATETIME_FIELDS]
+    rows = list(rows)
+    for row in rows:
+        for field in datetime_fields:
+            row[field] = iso_datetime(row[field])
+    return rows
+
+
+def serialize_documents(rows, fields=DOCUMENT_VALUES):
+    """Serialize Document.values(*fields) rows"""
+    return _serialize_rows(rows, fields)
+
+
+def serialize_knowledge_sources(rows, fields=KNOWLEDGE_SOURCE_VALUES):
+    """Serialize annotated KnowledgeSource.values(*fields) rows"""
+    return _serialize_rows(rows, fields)
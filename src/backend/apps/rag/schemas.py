@@ -0,0 +1,57 @@
+"""
+Request schemas for the RAG ingest endpoints
+Validated with pydantic in one pass instead of per DRF serializer field.
+"""
+from typing import Annotated, Any, Optional
+from django.core.files.uploadedfile import UploadedFile
+from pydantic import (
+    AfterValidator, BaseModel, BeforeValidator, ConfigDict, Field, Json,
+    StringConstraints, TypeAdapter, ValidationError
+)
+
+
+class TextIngest(BaseModel):
+    """Schema for text ingestion"""
+    text: Annotated[str, StringConstraints(strip_whitespace=True, min_length=1)]
+    title: Annotated[str, StringConstraints(strip_whitespace=True)] = 'Untitled Text'
+    metadata: Any = Field(default_factory=dict)
+    knowledge_source_id: Optional[int] = None
+
+
+TextIngestBatch = TypeAdapter(list[TextIngest])
+
+
+def _not_empty(file):
+    if not file.size:
+        raise ValueError('The submitted file is empty.')
+    return file
+
+
+def _blank_to_none(value):
+    # Form fields arrive as strings; an empty one means "not set"
+    return None if value == '' else value
+
+
+class FileIngest(BaseModel):
+    """Schema for file ingestion; validated from the multipart form"""
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    file: Annotated[UploadedFile, AfterValidator(_not_empty)]
+    title: Optional[Annotated[str, StringConstraints(strip_whitespace=True)]] = None
+    # Sent as a JSON string alongside the file
+    metadata: Json[Any] = Field(default_factory=dict)
+    knowledge_source_id: Annotated[Optional[int], BeforeValidator(_blank_to_none)] = None
+
+    @classmethod
+    def from_request(cls, request):
+        data = request.data
+        return cls.model_validate(data.dict() if hasattr(data, 'dict') else data)
+
+
+def validation_errors(exc: ValidationError):
+    """Flatten pydantic errors into DRF's {field: [messages]} shape"""
+    errors = {}
+    for error in exc.errors():
+        field = '.'.join(str(part) for part in error['loc']) or 'non_field_errors'
+        errors.setdefault(field, []).append(error['msg'])
+    return errors
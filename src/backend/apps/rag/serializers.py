@@ -1,41 +1,23 @@
 from rest_framework import serializers
+from apps.common.serializers import CachedModelSerializer
 from .models import Document, KnowledgeSource
 
 
-class DocumentSerializer(serializers.ModelSerializer):
+class DocumentSerializer(CachedModelSerializer):
     class Meta:
         model = Document
         fields = ['id', 'title', 'content', 'file_path', 'file_type', 'file_size', 'metadata', 'knowledge_source_id', 'created_at', 'updated_at']
         read_only_fields = ['id', 'created_at', 'updated_at']
 
 
-class KnowledgeSourceSerializer(serializers.ModelSerializer):
-    document_count = serializers.SerializerMethodField()
+class KnowledgeSourceSerializer(CachedModelSerializer):
+    document_count = serializers.IntegerField(read_only=True, default=0)
 
     class Meta:
         model = KnowledgeSource
         fields = ['id', 'name', 'description', 'source_type', 'config', 'is_active', 'document_count', 'created_at', 'updated_at']
         read_only_fields = ['id', 'created_at', 'updated_at']
 
-    def get_document_count(self, obj):
-        return Document.objects.filter(knowledge_source_id=obj.id).count()
-
-
-class TextIngestSerializer(serializers.Serializer):
-    """Serializer for text ingestion"""
-    text = serializers.CharField(required=True)
-    title = serializers.CharField(required=False, allow_blank=True)
-    metadata = serializers.JSONField(required=False)
-    knowledge_source_id = serializers.IntegerField(required=False, allow_null=True)
-
-
-class FileIngestSerializer(serializers.Serializer):
-    """Serializer for file ingestion"""
-    file = serializers.FileField(required=True)
-    title = serializers.CharField(required=False, allow_blank=True)
-    metadata = serializers.JSONField(required=False)
-    knowledge_source_id = serializers.IntegerField(required=False, allow_null=True)
-
 
 class SearchSerializer(serializers.Serializer):
     """Serializer for search requests"""
@@ -0,0 +1,28 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import Document, KnowledgeSource
+from .stats import invalidate_stats
+from .uploads import remove_upload
+
+
+@receiver(post_save, sender=Document)
+@receiver(post_save, sender=KnowledgeSource)
+def invalidate_stats_on_create(sender, instance, created, **kwargs):
+    """Only new rows change the counts"""
+    if created:
+        invalidate_stats()
+
+
+@receiver(post_delete, sender=Document)
+@receiver(post_delete, sender=KnowledgeSource)
+def invalidate_stats_on_delete(sender, instance, **kwargs):
+    invalidate_stats()
+
+
+@receiver(post_delete, sender=Document)
+def remove_document_upload(sender, instance, **kwargs):
+    """Delete the stored file once the document's deletion is committed"""
+    file_path = instance.file_path
+    if file_path:
+        transaction.on_commit(lambda: remove_upload(file_path))
@@ -0,0 +1,28 @@
+"""
+Cached RAG statistics
+Shared through Django's cache for a short TTL and dropped whenever a
+document or knowledge source is created or deleted
+"""
+from django.core.cache import cache
+from .models import Document, KnowledgeSource
+
+STATS_CACHE_KEY = 'rag_stats'
+STATS_CACHE_TTL = 30
+
+
+def compute_stats():
+    """Count documents and knowledge sources"""
+    return {
+        'documents': Document.objects.count(),
+        'knowledge_sources': KnowledgeSource.objects.count()
+    }
+
+
+def get_stats():
+    """Get RAG statistics, computing them at most once per TTL"""
+    return cache.get_or_set(STATS_CACHE_KEY, compute_stats, STATS_CACHE_TTL)
+
+
+def invalidate_stats():
+    """Drop the cached statistics"""
+    cache.delete(STATS_CACHE_KEY)
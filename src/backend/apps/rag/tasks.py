@@ -0,0 +1,33 @@
+"""
+Background tasks for RAG documents
+"""
+import logging
+from celery import shared_task
+from django.utils import timezone
+from .models import Document
+from .uploads import upload_path
+
+logger = logging.getLogger(__name__)
+
+# File types whose content can be read as-is; other formats need an
+# extractor and keep their empty content for now
+TEXT_FILE_TYPES = ('text/', 'application/json')
+
+
+@shared_task(ignore_result=True)
+def process_document(document_id):
+    """Load an uploaded document's text into its content column"""
+    document = Document.objects.filter(pk=document_id).values('file_path', 'file_type').first()
+    if document is None or not document['file_path']:
+        return
+    if not (document['file_type'] or '').startswith(TEXT_FILE_TYPES):
+        return
+
+    try:
+        with open(upload_path(document['file_path']), encoding='utf-8', errors='replace') as f:
+            content = f.read()
+    except OSError as e:
+        logger.warning(f"Could not read upload for document {document_id}: {e}")
+        return
+
+    Document.objects.filter(pk=document_id).update(content=content, updated_at=timezone.now())
@@ -0,0 +1,156 @@
+import os
+import tempfile
+from unittest import mock
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import DatabaseError
+from django.test import SimpleTestCase, TestCase, override_settings
+from pydantic import ValidationError
+from rest_framework.test import APIClient
+from .models import Document
+from .schemas import FileIngest, TextIngest, TextIngestBatch, validation_errors
+from .uploads import upload_path
+
+
+class TextIngestTests(SimpleTestCase):
+    def test_defaults_and_stripping(self):
+        item = TextIngest.model_validate_json(b'{"text": "  hello  "}')
+        self.assertEqual(item.text, 'hello')
+        self.assertEqual(item.title, 'Untitled Text')
+        self.assertEqual(item.metadata, {})
+        self.assertIsNone(item.knowledge_source_id)
+
+    def test_blank_text_is_rejected(self):
+        for body in (b'{}', b'{"text": "   "}'):
+            with self.subTest(body=body), self.assertRaises(ValidationError):
+                TextIngest.model_validate_json(body)
+
+    def test_batch(self):
+        items = TextIngestBatch.validate_json(b'[{"text": "a", "title": " A "}, {"text": "b", "knowledge_source_id": 3}]')
+        self.assertEqual([(item.text, item.title, item.knowledge_source_id) for item in items], [
+            ('a', 'A', None),
+            ('b', 'Untitled Text', 3),
+        ])
+
+    def test_validation_errors_are_flattened_by_field(self):
+        with self.assertRaises(ValidationError) as raised:
+            TextIngestBatch.validate_json(b'[{"text": "a"}, {"text": "", "knowledge_source_id": "x"}]')
+        errors = validation_errors(raised.exception)
+        self.assertEqual(sorted(errors), ['1.knowledge_source_id', '1.text'])
+        self.assertTrue(all(isinstance(messages, list) for messages in errors.values()))
+
+
+class FileIngestTests(SimpleTestCase):
+    def _file(self, content=b'hello'):
+        return SimpleUploadedFile('notes.txt', content, content_type='text/plain')
+
+    def test_form_values(self):
+        item = FileIngest.model_validate({
+            'file': self._file(),
+            'title': '  Notes ',
+            'metadata': '{"tags": ["a"]}',
+            'knowledge_source_id': '4'
+        })
+        self.assertEqual(item.title, 'Notes')
+        self.assertEqual(item.metadata, {'tags': ['a']})
+        self.assertEqual(item.knowledge_source_id, 4)
+
+    def test_optional_fields(self):
+        item = FileIngest.model_validate({'file': self._file(), 'knowledge_source_id': ''})
+        self.assertIsNone(item.title)
+        self.assertEqual(item.metadata, {})
+        self.assertIsNone(item.knowledge_source_id)
+
+    def test_invalid_values(self):
+        cases = {
+            'file': {'file': self._file(b'')},
+            'metadata': {'file': self._file(), 'metadata': '{not json'},
+            'knowledge_source_id': {'file': self._file(), 'knowledge_source_id': 'x'},
+        }
+        for field, data in cases.items():
+            with self.subTest(field=field), self.assertRaises(ValidationError) as raised:
+                FileIngest.model_validate(data)
+            self.assertIn(field, validation_errors(raised.exception))
+
+    def test_missing_file(self):
+        with self.assertRaises(ValidationError) as raised:
+            FileIngest.model_validate({'title': 'Notes'})
+        self.assertIn('file', validation_errors(raised.exception))
+
+
+class IngestEndpointTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_ingest_text(self):
+        response = self.client.post('/api/rag/ingest/text/', {'text': 'hello', 'title': 'Greeting'}, format='json')
+        self.assertEqual(response.status_code, 201)
+        document = Document.objects.get(pk=response.json()['id'])
+        self.assertEqual((document.title, document.content), ('Greeting', 'hello'))
+
+    def test_ingest_text_batch(self):
+        response = self.client.post('/api/rag/ingest/text/', [{'text': 'a'}, {'text': 'b'}], format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([item['status'] for item in response.json()], ['ingested', 'ingested'])
+        self.assertEqual(Document.objects.count(), 2)
+
+    def test_ingest_text_errors(self):
+        response = self.client.post('/api/rag/ingest/text/', {'text': ''}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('text', response.json())
+        self.assertFalse(Document.objects.exists())
+
+
+class FileIngestEndpointTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        self.media_root = media_root.name
+        settings_override = override_settings(MEDIA_ROOT=media_root.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def _upload(self, **data):
+        data['file'] = SimpleUploadedFile('notes.txt', b'file text', content_type='text/plain')
+        return self.client.post('/api/rag/ingest/file/', data, format='multipart')
+
+    def test_ingest_file(self):
+        response = self._upload(metadata='{"a": 1}')
+        self.assertEqual(response.status_code, 202)
+        document = Document.objects.get(pk=response.json()['id'])
+        self.assertEqual(document.metadata, {'a': 1})
+        self.assertEqual(document.file_size, 9)
+
+    def test_ingest_file_errors(self):
+        response = self.client.post('/api/rag/ingest/file/', {'metadata': '{not json'}, format='multipart')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(sorted(response.json()), ['file', 'metadata'])
+        self.assertFalse(Document.objects.exists())
+
+    @override_settings(USE_CELERY_WORKER=False)
+    def test_content_is_loaded_without_a_worker(self):
+        document_id = self._upload().json()['id']
+        self.assertEqual(Document.objects.get(pk=document_id).content, 'file text')
+
+    @override_settings(USE_CELERY_WORKER=True)
+    def test_worker_gets_the_processing_task(self):
+        with mock.patch('apps.rag.views.process_document') as process_document:
+            document_id = self._upload().json()['id']
+        process_document.delay.assert_called_once_with(document_id)
+        process_document.assert_not_called()
+
+    def test_deleting_the_document_removes_its_file(self):
+        document = Document.objects.get(pk=self._upload().json()['id'])
+        path = upload_path(document.file_path)
+        self.assertTrue(os.path.exists(path))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.delete(f'/api/rag/documents/{document.id}/')
+        self.assertEqual(response.status_code, 204)
+        self.assertFalse(os.path.exists(path))
+
+    def test_failed_insert_removes_the_file(self):
+        with mock.patch.object(Document.objects, 'create', side_effect=DatabaseError('insert failed')), \
+                self.assertRaises(DatabaseError):
+            self._upload()
+        self.assertEqual(os.listdir(self.media_root), [])
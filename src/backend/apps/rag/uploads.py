@@ -0,0 +1,40 @@
+"""
+Storage for uploaded RAG files
+Files are copied to MEDIA_ROOT in chunks, so a large upload (spooled to a
+temporary file by Django) never has to sit in memory in full
+"""
+import logging
+import os
+import uuid
+from django.conf import settings
+from django.utils.text import get_valid_filename
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_CHUNK_SIZE = 64 * 1024
+WRITE_BUFFER_SIZE = 1024 * 1024
+
+
+def store_upload(uploaded_file):
+    """Write an uploaded file under MEDIA_ROOT and return its file_path"""
+    name = f'{uuid.uuid4().hex}_{get_valid_filename(os.path.basename(uploaded_file.name))}'
+    os.makedirs(settings.MEDIA_ROOT, exist_ok=True)
+    with open(os.path.join(settings.MEDIA_ROOT, name), 'wb', buffering=WRITE_BUFFER_SIZE) as destination:
+        for chunk in uploaded_file.chunks(UPLOAD_CHUNK_SIZE):
+            destination.write(chunk)
+    return f'uploads/{name}'
+
+
+def upload_path(file_path):
+    """Resolve a stored file_path back to its location on disk"""
+    return os.path.join(settings.MEDIA_ROOT, os.path.basename(file_path))
+
+
+def remove_upload(file_path):
+    """Delete a stored file; one that is already gone is not an error"""
+    try:
+        os.remove(upload_path(file_path))
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        logger.warning(f"Could not remove upload {file_path}: {e}")
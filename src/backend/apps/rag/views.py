@@ -2,23 +2,148 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny
+from rest_framework.generics import get_object_or_404
 from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Substr
+from django.utils import timezone
+from pydantic import ValidationError
 from .models import Document, KnowledgeSource
 from .serializers import (
     DocumentSerializer, KnowledgeSourceSerializer,
-    TextIngestSerializer, FileIngestSerializer,
     SearchSerializer, EmbeddingSerializer,
-    RAGConfigSerializer, DocumentMoveSerializer,
-    ChunkSerializer
+    RAGConfigSerializer, DocumentMoveSerializer
 )
+from .fast_serializers import (
+    serialize_documents, serialize_knowledge_sources, requested_fields,
+    DOCUMENT_VALUES, KNOWLEDGE_SOURCE_VALUES
+)
+from .stats import get_stats, invalidate_stats
+from .tasks import process_document
+from .uploads import store_upload, remove_upload
+from .schemas import FileIngest, TextIngest, TextIngestBatch, validation_errors
+from apps.common.pagination import WindowCountPagination
+from apps.common.responses import ORJSONResponse
+from apps.common.tasks import enqueue
+import orjson
 import time
 import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RAG_CONFIG = {
+    'embedding_model': 'text-embedding-ada-002',
+    'chunk_size': 500,
+    'chunk_overlap': 50,
+    'top_k': 5,
+    'similarity_threshold': 0.7
+}
+
+# Characters of a document shown by the chunks preview, and the chunk size
+CHUNK_WINDOW = 1000
+CHUNK_SIZE = 500
+
+# Mock embedding (in production, this would call OpenAI/other embedding
+# service); built once and shared since it never changes
+EMBEDDING_DIMENSION = 1536  # Standard embedding size
+MOCK_EMBEDDING = (0.1,) * EMBEDDING_DIMENSION
+
+# Bodies of the static endpoints, encoded once at import; only the health
+# timestamp and the info statistics change between calls
+MEDIA_INFO_JSON = orjson.dumps({
+    'supported_formats': [
+        'pdf', 'docx', 'txt', 'md',
+        'jpg', 'png', 'gif',
+        'mp3', 'wav', 'mp4'
+    ],
+    'max_file_size': 10485760,  # 10MB
+    'processing_capabilities': {
+        'text_extraction': True,
+        'image_ocr': True,
+        'audio_transcription': True,
+        'video_analysis': True
+    }
+})
+HEALTH_JSON_HEAD = b'{"status":"healthy","timestamp":'
+HEALTH_JSON_TAIL = b',"services":' + orjson.dumps({
+    'database': 'ok',
+    'vector_db': 'ok',
+    'embedding_service': 'ok'
+}) + b'}'
+INFO_JSON_HEAD = b'{"system":"RAG System","version":"1.0.0","statistics":'
+INFO_JSON_TAIL = b',"capabilities":' + orjson.dumps({
+    'text_ingestion': True,
+    'file_ingestion': True,
+    'vector_search': True,
+    'similarity_search': True
+}) + b'}'
+
+# Process-local copy of rag_config in front of the shared cache; the short
+# TTL bounds how long other workers serve a stale copy after an update
+RAG_CONFIG_LOCAL_TTL = 5
+_local_config = {'value': None, 'fetched_at': 0.0}
+
+
+def _get_rag_config():
+    """Get the RAG config, hitting the shared cache at most once per TTL"""
+    now = time.monotonic()
+    if _local_config['value'] is None or now - _local_config['fetched_at'] >= RAG_CONFIG_LOCAL_TTL:
+        _local_config['value'] = cache.get('rag_config', DEFAULT_RAG_CONFIG)
+        _local_config['fetched_at'] = now
+    return _local_config['value']
+
+
+def _chunk_offsets(length, size=CHUNK_SIZE, stride=CHUNK_SIZE):
+    """(start, end) pairs of a sliding window over `length` characters"""
+    return [(start, min(start + size, length)) for start in range(0, length, stride)]
+
+
+def _create_upload_document(uploaded_file, **fields):
+    """Store an upload and create its Document; the file is removed if the insert fails"""
+    file_path = store_upload(uploaded_file)
+    try:
+        return Document.objects.create(
+            file_path=file_path,
+            file_type=uploaded_file.content_type,
+            file_size=uploaded_file.size,
+            **fields
+        )
+    except Exception:
+        remove_upload(file_path)
+        raise
+
+
+def _queue_processing(document_id):
+    """
+    Hand an uploaded document to the background processor; without a
+    Celery worker it is processed before the response is sent
+    """
+    try:
+        enqueue(process_document, document_id, inline=True)
+    except Exception as e:
+        logger.warning(f"Could not queue processing for document {document_id}: {e}")
 
 
 class DocumentViewSet(viewsets.ModelViewSet):
     permission_classes = [AllowAny]
     serializer_class = DocumentSerializer
     queryset = Document.objects.all()
+    pagination_class = WindowCountPagination
+
+    def list(self, request, *args, **kwargs):
+        """
+        List documents, serialized from values() rows
+        ?fields=a,b limits the columns fetched and returned
+        """
+        fields = requested_fields(request, DOCUMENT_VALUES)
+        queryset = self.filter_queryset(self.get_queryset()).values(*fields)
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(serialize_documents(page, fields))
+        return Response(serialize_documents(queryset, fields))
 
     @action(detail=True, methods=['put'])
     def move(self, request, pk=None):
@@ -26,7 +151,6 @@ class DocumentViewSet(viewsets.ModelViewSet):
         PUT /api/rag/documents/{id}/move/
         Move document to another knowledge source
         """
-        document = self.get_object()
         serializer = DocumentMoveSerializer(data=request.data)
 
         if not serializer.is_valid():
@@ -34,23 +158,28 @@ class DocumentViewSet(viewsets.ModelViewSet):
 
         target_id = serializer.validated_data['target_knowledge_source_id']
 
+        # Only the fields echoed back are needed; skip loading the content
+        document = get_object_or_404(
+            self.get_queryset().values('id', 'title', 'knowledge_source_id'),
+            pk=pk
+        )
+
         # Check if target knowledge source exists
-        try:
-            target_ks = KnowledgeSource.objects.get(id=target_id)
-        except KnowledgeSource.DoesNotExist:
+        if not KnowledgeSource.objects.filter(id=target_id).exists():
             return Response(
                 {'error': 'Target knowledge source not found'},
                 status=status.HTTP_404_NOT_FOUND
             )
 
-        old_ks_id = document.knowledge_source_id
-        document.knowledge_source_id = target_id
-        document.save()
+        Document.objects.filter(pk=document['id']).update(
+            knowledge_source_id=target_id,
+            updated_at=timezone.now()
+        )
 
         return Response({
-            'id': document.id,
-            'title': document.title,
-            'old_knowledge_source_id': old_ks_id,
+            'id': document['id'],
+            'title': document['title'],
+            'old_knowledge_source_id': document['knowledge_source_id'],
             'new_knowledge_source_id': target_id,
             'moved_at': time.time()
         }, status=status.HTTP_200_OK)
@@ -61,39 +190,36 @@ class DocumentViewSet(viewsets.ModelViewSet):
         GET /api/rag/documents/{id}/chunks/
         Get chunks of a document
         """
-        document = self.get_object()
+        # Only the first CHUNK_WINDOW characters are chunked; slice in SQL so
+        # large documents never leave the database in full
+        document = get_object_or_404(
+            self.get_queryset().annotate(head=Substr('content', 1, CHUNK_WINDOW)).values('id', 'head'),
+            pk=pk
+        )
+        document_id = document['id']
+        head = document['head'] or ''
 
         # Mock chunks - in production, this would retrieve from vector DB
         chunks = [
             {
-                'id': f'{document.id}_chunk_1',
-                'content': document.content[:500] if document.content else 'No content',
+                'id': f'{document_id}_chunk_{index + 1}',
+                'content': head[start:end] or ('No content' if index == 0 else ''),
                 'metadata': {
-                    'document_id': document.id,
-                    'chunk_index': 0,
-                    'start_char': 0,
-                    'end_char': 500
+                    'document_id': document_id,
+                    'chunk_index': index,
+                    'start_char': start,
+                    'end_char': end
                 },
-                'score': 1.0
-            },
-            {
-                'id': f'{document.id}_chunk_2',
-                'content': document.content[500:1000] if len(document.content) > 500 else '',
-                'metadata': {
-                    'document_id': document.id,
-                    'chunk_index': 1,
-                    'start_char': 500,
-                    'end_char': 1000
-                },
-                'score': 0.95
+                'score': round(1.0 - 0.05 * index, 2)
             }
+            for index, (start, end) in enumerate(_chunk_offsets(CHUNK_WINDOW))
         ]
 
-        serializer = ChunkSerializer(chunks, many=True)
+        # Plain dicts already in the response shape; no serializer pass needed
         return Response({
-            'document_id': document.id,
+            'document_id': document_id,
             'total_chunks': len(chunks),
-            'chunks': serializer.data
+            'chunks': chunks
         }, status=status.HTTP_200_OK)
 
 
@@ -102,41 +228,70 @@ class KnowledgeSourceViewSet(viewsets.ModelViewSet):
     serializer_class = KnowledgeSourceSerializer
     queryset = KnowledgeSource.objects.all()
 
+    def get_queryset(self):
+        # Count documents in a correlated subquery (documents only store a
+        # plain knowledge_source_id, there is no FK to aggregate over)
+        document_count = (
+            Document.objects
+            .filter(knowledge_source_id=OuterRef('pk'))
+            .order_by()
+            .values('knowledge_source_id')
+            .annotate(count=Count('id'))
+            .values('count')
+        )
+        return KnowledgeSource.objects.annotate(
+            document_count=Coalesce(Subquery(document_count), 0)
+        )
+
+    def list(self, request, *args, **kwargs):
+        """
+        List knowledge sources, serialized from values() rows
+        ?fields=a,b limits the columns fetched and returned
+        """
+        fields = requested_fields(request, KNOWLEDGE_SOURCE_VALUES)
+        queryset = self.filter_queryset(self.get_queryset()).values(*fields)
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(serialize_knowledge_sources(page, fields))
+        return Response(serialize_knowledge_sources(queryset, fields))
+
     @action(detail=True, methods=['post'])
     def upload_document(self, request, pk=None):
         """Upload a document to the knowledge source"""
-        knowledge_source = self.get_object()
+        # Only the id is needed; skip hydrating the source and its document count
+        ks_id = get_object_or_404(KnowledgeSource.objects.values_list('id', flat=True), pk=pk)
 
-        serializer = FileIngestSerializer(data=request.data)
-        if not serializer.is_valid():
-            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            form = FileIngest.from_request(request)
+        except ValidationError as e:
+            return Response(validation_errors(e), status=status.HTTP_400_BAD_REQUEST)
 
-        uploaded_file = serializer.validated_data['file']
-        title = serializer.validated_data.get('title', uploaded_file.name)
-        metadata = serializer.validated_data.get('metadata', {})
+        uploaded_file = form.file
+        title = uploaded_file.name if form.title is None else form.title
+        metadata = form.metadata
 
         # Create document
-        document = Document.objects.create(
+        document = _create_upload_document(
+            uploaded_file,
             title=title,
             content='',  # Will be populated during processing
-            file_path=f'uploads/{uploaded_file.name}',
-            file_type=uploaded_file.content_type,
-            file_size=uploaded_file.size,
             metadata=metadata,
-            knowledge_source_id=knowledge_source.id
+            knowledge_source_id=ks_id
         )
+        _queue_processing(document.id)
 
         return Response({
             'id': document.id,
             'title': document.title,
             'status': 'uploaded',
-            'knowledge_source_id': knowledge_source.id
-        }, status=status.HTTP_201_CREATED)
+            'knowledge_source_id': ks_id
+        }, status=status.HTTP_202_ACCEPTED)
 
     @action(detail=True, methods=['post'])
     def query(self, request, pk=None):
         """Query the knowledge source"""
-        knowledge_source = self.get_object()
+        # Only the id is needed; skip hydrating the source and its document count
+        ks_id = get_object_or_404(KnowledgeSource.objects.values_list('id', flat=True), pk=pk)
 
         query = request.data.get('query')
         if not query:
@@ -152,7 +307,7 @@ class KnowledgeSourceViewSet(viewsets.ModelViewSet):
                 'score': 0.9 - (i * 0.1),
                 'metadata': {
                     'document_id': i,
-                    'knowledge_source_id': knowledge_source.id
+                    'knowledge_source_id': ks_id
                 }
             }
             for i in range(1, min(top_k + 1, 6))
@@ -160,7 +315,7 @@ class KnowledgeSourceViewSet(viewsets.ModelViewSet):
 
         return Response({
             'query': query,
-            'knowledge_source_id': knowledge_source.id,
+            'knowledge_source_id': ks_id,
             'total_results': len(results),
             'results': results
         }, status=status.HTTP_200_OK)
@@ -176,32 +331,54 @@ class RAGViewSet(viewsets.ViewSet):
     def ingest_text(self, request):
         """
         POST /api/rag/ingest/text/
-        Ingest text content
+        Ingest text content; accepts one object or a list of them
         """
-        serializer = TextIngestSerializer(data=request.data)
-        if not serializer.is_valid():
-            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        # Validate JSON straight from the body instead of going through
+        # DRF's parser and serializer fields; a list ingests a batch
+        try:
+            if request.content_type.startswith('application/json'):
+                many = request.body.lstrip()[:1] == b'['
+                if many:
+                    items = TextIngestBatch.validate_json(request.body)
+                else:
+                    items = [TextIngest.model_validate_json(request.body)]
+            else:
+                many = False
+                items = [TextIngest.model_validate(request.data.dict())]
+        except ValidationError as e:
+            return Response(validation_errors(e), status=status.HTTP_400_BAD_REQUEST)
+
+        documents = [
+            Document(
+                title=item.title,
+                content=item.text,
+                file_type='text/plain',
+                file_size=len(item.text),
+                metadata=item.metadata,
+                knowledge_source_id=item.knowledge_source_id
+            )
+            for item in items
+        ]
 
-        text = serializer.validated_data['text']
-        title = serializer.validated_data.get('title', 'Untitled Text')
-        metadata = serializer.validated_data.get('metadata', {})
-        ks_id = serializer.validated_data.get('knowledge_source_id')
+        if many:
+            with transaction.atomic():
+                Document.objects.bulk_create(documents, batch_size=500)
+            # bulk_create doesn't send post_save
+            invalidate_stats()
+        else:
+            documents[0].save()
 
-        document = Document.objects.create(
-            title=title,
-            content=text,
-            file_type='text/plain',
-            file_size=len(text),
-            metadata=metadata,
-            knowledge_source_id=ks_id
-        )
+        results = [
+            {
+                'id': document.id,
+                'title': document.title,
+                'status': 'ingested',
+                'chunks_created': document.file_size // CHUNK_SIZE + 1
+            }
+            for document in documents
+        ]
 
-        return Response({
-            'id': document.id,
-            'title': document.title,
-            'status': 'ingested',
-            'chunks_created': len(text) // 500 + 1
-        }, status=status.HTTP_201_CREATED)
+        return Response(results if many else results[0], status=status.HTTP_201_CREATED)
 
     @action(detail=False, methods=['post'], url_path='ingest/file')
     def ingest_file(self, request):
@@ -209,31 +386,31 @@ class RAGViewSet(viewsets.ViewSet):
         POST /api/rag/ingest/file/
         Ingest file content
         """
-        serializer = FileIngestSerializer(data=request.data)
-        if not serializer.is_valid():
-            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            form = FileIngest.from_request(request)
+        except ValidationError as e:
+            return Response(validation_errors(e), status=status.HTTP_400_BAD_REQUEST)
 
-        uploaded_file = serializer.validated_data['file']
-        title = serializer.validated_data.get('title', uploaded_file.name)
-        metadata = serializer.validated_data.get('metadata', {})
-        ks_id = serializer.validated_data.get('knowledge_source_id')
+        uploaded_file = form.file
+        title = uploaded_file.name if form.title is None else form.title
+        metadata = form.metadata
+        ks_id = form.knowledge_source_id
 
-        document = Document.objects.create(
+        document = _create_upload_document(
+            uploaded_file,
             title=title,
             content='',
-            file_path=f'uploads/{uploaded_file.name}',
-            file_type=uploaded_file.content_type,
-            file_size=uploaded_file.size,
             metadata=metadata,
             knowledge_source_id=ks_id
         )
+        _queue_processing(document.id)
 
         return Response({
             'id': document.id,
             'title': document.title,
             'status': 'processing',
             'file_size': uploaded_file.size
-        }, status=status.HTTP_201_CREATED)
+        }, status=status.HTTP_202_ACCEPTED)
 
     @action(detail=False, methods=['post'])
     def search(self, request):
@@ -247,7 +424,7 @@ class RAGViewSet(viewsets.ViewSet):
 
         query = serializer.validated_data['query']
         top_k = serializer.validated_data.get('top_k', 5)
-        ks_id = serializer.validated_data.get('knowledge_source_id')
+        ks_id = serializer.validated_data.get('knowledge_source_id') or 1
 
         # Mock search results
         results = [
@@ -257,13 +434,13 @@ class RAGViewSet(viewsets.ViewSet):
                 'score': 0.95 - (i * 0.08),
                 'metadata': {
                     'document_id': i,
-                    'knowledge_source_id': ks_id or 1
+                    'knowledge_source_id': ks_id
                 }
             }
             for i in range(top_k)
         ]
 
-        return Response({
+        return ORJSONResponse({
             'query': query,
             'total_results': len(results),
             'results': results
@@ -293,7 +470,7 @@ class RAGViewSet(viewsets.ViewSet):
             for i in range(top_k)
         ]
 
-        return Response({
+        return ORJSONResponse({
             'query': query,
             'search_type': 'similarity',
             'results': results
@@ -305,24 +482,15 @@ class RAGViewSet(viewsets.ViewSet):
         GET /api/rag/info/
         Get RAG system information
         """
-        total_docs = Document.objects.count()
-        total_ks = KnowledgeSource.objects.count()
+        stats = get_stats()
+        total_docs = stats['documents']
+        statistics = orjson.dumps({
+            'total_documents': total_docs,
+            'total_knowledge_sources': stats['knowledge_sources'],
+            'total_chunks': total_docs * 10  # Mock
+        })
 
-        return Response({
-            'system': 'RAG System',
-            'version': '1.0.0',
-            'statistics': {
-                'total_documents': total_docs,
-                'total_knowledge_sources': total_ks,
-                'total_chunks': total_docs * 10  # Mock
-            },
-            'capabilities': {
-                'text_ingestion': True,
-                'file_ingestion': True,
-                'vector_search': True,
-                'similarity_search': True
-            }
-        }, status=status.HTTP_200_OK)
+        return HttpResponse(INFO_JSON_HEAD + statistics + INFO_JSON_TAIL, content_type='application/json')
 
     @action(detail=False, methods=['get'])
     def health(self, request):
@@ -330,15 +498,8 @@ class RAGViewSet(viewsets.ViewSet):
         GET /api/rag/health/
         Health check for RAG system
         """
-        return Response({
-            'status': 'healthy',
-            'timestamp': time.time(),
-            'services': {
-                'database': 'ok',
-                'vector_db': 'ok',
-                'embedding_service': 'ok'
-            }
-        }, status=status.HTTP_200_OK)
+        body = HEALTH_JSON_HEAD + orjson.dumps(time.time()) + HEALTH_JSON_TAIL
+        return HttpResponse(body, content_type='application/json')
 
     @action(detail=False, methods=['get'])
     def config(self, request):
@@ -346,18 +507,9 @@ class RAGViewSet(viewsets.ViewSet):
         GET /api/rag/config/
         Get RAG configuration
         """
-        # Get from cache or use defaults
-        config = cache.get('rag_config', {
-            'embedding_model': 'text-embedding-ada-002',
-            'chunk_size': 500,
-            'chunk_overlap': 50,
-            'top_k': 5,
-            'similarity_threshold': 0.7
-        })
-
-        return Response(config, status=status.HTTP_200_OK)
+        return Response(_get_rag_config(), status=status.HTTP_200_OK)
 
-    @action(detail=False, methods=['put'])
+    @config.mapping.put
     def update_config(self, request):
         """
         PUT /api/rag/config/
@@ -367,8 +519,9 @@ class RAGViewSet(viewsets.ViewSet):
         if not serializer.is_valid():
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-        # Save to cache
+        # Save to cache and drop this process's copy
         cache.set('rag_config', serializer.validated_data, timeout=None)
+        _local_config['value'] = None
 
         return Response({
             'status': 'updated',
@@ -388,14 +541,11 @@ class RAGViewSet(viewsets.ViewSet):
         text = serializer.validated_data['text']
         model = serializer.validated_data.get('model')
 
-        # Mock embedding (in production, this would call OpenAI/other embedding service)
-        mock_embedding = [0.1] * 1536  # Standard embedding size
-
         return Response({
             'text': text[:100] + '...' if len(text) > 100 else text,
             'model': model,
-            'embedding': mock_embedding,
-            'dimension': len(mock_embedding)
+            'embedding': MOCK_EMBEDDING,
+            'dimension': EMBEDDING_DIMENSION
         }, status=status.HTTP_200_OK)
 
     @action(detail=False, methods=['post'], url_path='process/chat-file')
@@ -423,17 +573,4 @@ class RAGViewSet(viewsets.ViewSet):
         GET /api/rag/media/info/
         Get media processing information
         """
-        return Response({
-            'supported_formats': [
-                'pdf', 'docx', 'txt', 'md',
-                'jpg', 'png', 'gif',
-                'mp3', 'wav', 'mp4'
-            ],
-            'max_file_size': 10485760,  # 10MB
-            'processing_capabilities': {
-                'text_extraction': True,
-                'image_ocr': True,
-                'audio_transcription': True,
-                'video_analysis': True
-            }
-        }, status=status.HTTP_200_OK)
+        return HttpResponse(MEDIA_INFO_JSON, content_type='application/json')
@@ -0,0 +1,59 @@
+"""
+In-process circuit breaker for upstream provider calls
+After repeated failures a key is OPEN and calls are skipped; once the reset
+timeout has passed a single probe is let through (HALF_OPEN) and its
+outcome closes or re-opens the circuit.
+"""
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitBreaker:
+    def __init__(self, name, failure_threshold=5, reset_timeout=60):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        # key -> [state, consecutive failures, opened at]
+        self._circuits = {}
+        self._lock = threading.Lock()
+
+    def allow(self, key):
+        """Whether a call for key may go upstream now"""
+        with self._lock:
+            circuit = self._circuits.get(key)
+            if circuit is None or circuit[0] == CLOSED:
+                return True
+            now = time.monotonic()
+            # A probe that never reported back is replaced after the same timeout
+            if now - circuit[2] >= self.reset_timeout:
+                circuit[0] = HALF_OPEN
+                circuit[2] = now
+                logger.warning(f"{self.name} circuit for {key} half-open, probing")
+                return True
+            return False
+
+    def record_success(self, key):
+        with self._lock:
+            circuit = self._circuits.pop(key, None)
+        if circuit is not None and circuit[0] != CLOSED:
+            logger.warning(f"{self.name} circuit for {key} closed")
+
+    def record_failure(self, key):
+        with self._lock:
+            circuit = self._circuits.setdefault(key, [CLOSED, 0, 0.0])
+            circuit[1] += 1
+            if circuit[0] == HALF_OPEN or circuit[1] >= self.failure_threshold:
+                tripped = circuit[0] != OPEN
+                circuit[0] = OPEN
+                circuit[2] = time.monotonic()
+            else:
+                tripped = False
+        if tripped:
+            logger.warning(f"{self.name} circuit for {key} open for {self.reset_timeout}s")
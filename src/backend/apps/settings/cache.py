@@ -0,0 +1,89 @@
+"""
+Caches of UserSettings for the chat hot paths
+The async views use an in-process cache; the sync views share a
+lightweight copy through Django's cache
+"""
+import threading
+from collections import namedtuple
+from cachetools import TTLCache
+from django.core.cache import cache
+from .models import UserSettings
+
+# Fields the chat endpoints need from UserSettings
+CHAT_SETTINGS_FIELDS = ('api_key', 'base_url', 'temperature', 'max_tokens', 'top_p')
+
+ChatSettings = namedtuple('ChatSettings', CHAT_SETTINGS_FIELDS)
+
+# Fields GET /api/settings needs from UserSettings
+PAGE_SETTINGS_FIELDS = ('api_key', 'base_url', 'model', 'rag_config')
+
+PageSettings = namedtuple('PageSettings', PAGE_SETTINGS_FIELDS)
+
+SETTINGS_CACHE_TTL = 60
+PAGE_SETTINGS_CACHE_TTL = 30
+
+
+def _settings_cache_key(user_id):
+    return f"usersettings:{user_id}"
+
+
+def _page_settings_cache_key(user_id):
+    return f"usersettings:page:{user_id}"
+
+
+def get_user_settings(user_id):
+    """
+    Get the chat-related settings for a user as a ChatSettings tuple
+    Raises UserSettings.DoesNotExist if there are none.
+    """
+    key = _settings_cache_key(user_id)
+    settings = cache.get(key)
+    if settings is None:
+        row = UserSettings.objects.only(*CHAT_SETTINGS_FIELDS).get(user_id=user_id)
+        settings = ChatSettings(*(getattr(row, field) for field in CHAT_SETTINGS_FIELDS))
+        cache.set(key, settings, SETTINGS_CACHE_TTL)
+    return settings
+
+async def aget_page_settings(user_id, defaults):
+    """
+    Get the settings-page fields for a user as a PageSettings tuple,
+    creating the user's settings from defaults if there are none
+    """
+    key = _page_settings_cache_key(user_id)
+    settings = await cache.aget(key)
+    if settings is None:
+        try:
+            row = await UserSettings.objects.only(*PAGE_SETTINGS_FIELDS).aget(user_id=user_id)
+        except UserSettings.DoesNotExist:
+            row, _ = await UserSettings.objects.aget_or_create(user_id=user_id, defaults=defaults)
+        settings = PageSettings(*(getattr(row, field) for field in PAGE_SETTINGS_FIELDS))
+        await cache.aset(key, settings, PAGE_SETTINGS_CACHE_TTL)
+    return settings
+
+# Short TTL bounds staleness across worker processes; saves in this
+# process invalidate immediately via signals
+_settings_cache = TTLCache(maxsize=4096, ttl=30)
+_settings_lock = threading.Lock()
+
+
+async def aget_cached_settings(user_id):
+    """
+    Get the chat-related settings for a user, hitting the DB at most once
+    per TTL window. Raises UserSettings.DoesNotExist if there are none.
+    """
+    with _settings_lock:
+        settings = _settings_cache.get(user_id)
+    if settings is not None:
+        return settings
+
+    settings = await UserSettings.objects.only(*CHAT_SETTINGS_FIELDS).aget(user_id=user_id)
+    with _settings_lock:
+        _settings_cache[user_id] = settings
+    return settings
+
+
+def invalidate_cached_settings(user_id):
+    """Drop a user's cached settings"""
+    with _settings_lock:
+        _settings_cache.pop(user_id, None)
+    cache.delete_many([_settings_cache_key(user_id), _page_settings_cache_key(user_id)])
@@ -0,0 +1,104 @@
+"""
+Per-provider rules for listing chat models
+Providers are looked up by the host of their base URL; anything unknown is
+treated as a generic OpenAI-compatible API.
+"""
+from dataclasses import dataclass
+from typing import Callable
+from urllib.parse import urlparse
+from apps.chat.llm import OPENROUTER_REFERER, OPENROUTER_APP_NAME
+
+# Model list filtering and ordering
+NON_CHAT_MODEL_MARKERS = ('embed', 'whisper', 'tts', 'dall-e')
+CHAT_MODEL_MARKERS = ('gpt', 'claude', 'llama', 'mistral', 'gemini', 'deepseek', 'chat')
+OPENROUTER_MODEL_PRIORITIES = ('claude-3', 'gpt-4', 'gpt-3.5', 'mixtral', 'llama')
+STANDARD_MODEL_PRIORITIES = ('gpt-4o', 'gpt-4-turbo', 'gpt-4', 'gpt-3.5-turbo', 'claude-3', 'llama')
+
+
+def _openrouter_sort_key(model):
+    """Sort by priority/popularity: first priority contained in the id"""
+    model_id, model_lower = model
+    rank = next(
+        (idx for idx, priority in enumerate(OPENROUTER_MODEL_PRIORITIES) if priority in model_lower),
+        len(OPENROUTER_MODEL_PRIORITIES)
+    )
+    return (rank, model_id)
+
+
+def _standard_sort_key(model):
+    """Sort by priority: first priority the id starts with"""
+    model_id = model[0]
+    if not model_id.startswith(STANDARD_MODEL_PRIORITIES):
+        return (len(STANDARD_MODEL_PRIORITIES), model_id)
+    rank = next(idx for idx, priority in enumerate(STANDARD_MODEL_PRIORITIES) if model_id.startswith(priority))
+    return (rank, model_id)
+
+
+def _versioned_models_url(base_url):
+    # Standard OpenAI-compatible endpoint
+    base_url = base_url.rstrip('/')
+    if not base_url.endswith('/v1'):
+        base_url = f"{base_url}/v1"
+    return f"{base_url}/models"
+
+
+@dataclass(frozen=True, slots=True)
+class ProviderSpec:
+    models_url: Callable[[str], str]
+    # Takes the lowercased model id
+    is_chat_model: Callable[[str], bool]
+    # Takes a (model id, lowercased id) pair
+    sort_key: Callable[[tuple], tuple]
+    extra_headers: tuple = ()
+    # Whether to list every model, sorted, when none pass the filter
+    fall_back_to_all: bool = True
+
+    def headers(self, api_key):
+        headers = {
+            'Authorization': f'Bearer {api_key}',
+            'Content-Type': 'application/json'
+        }
+        headers.update(self.extra_headers)
+        return headers
+
+    def pick_models(self, model_ids):
+        """Filter the chat models out of model_ids and order them"""
+        # Lowercase each id once for both the filter and the sort
+        filtered = [pair for pair in ((m, m.lower()) for m in model_ids) if self.is_chat_model(pair[1])]
+        if filtered:
+            return [model_id for model_id, _ in sorted(filtered, key=self.sort_key)]
+        return sorted(model_ids) if self.fall_back_to_all else []
+
+
+OPENROUTER = ProviderSpec(
+    # OpenRouter's models endpoint doesn't follow the base URL
+    models_url=lambda base_url: "https://openrouter.ai/api/v1/models",
+    is_chat_model=lambda ml: not any(x in ml for x in NON_CHAT_MODEL_MARKERS),
+    sort_key=_openrouter_sort_key,
+    # OpenRouter requires additional headers
+    extra_headers=(('HTTP-Referer', OPENROUTER_REFERER), ('X-Title', OPENROUTER_APP_NAME)),
+    fall_back_to_all=False
+)
+
+OPENAI = ProviderSpec(
+    models_url=_versioned_models_url,
+    is_chat_model=lambda ml: 'gpt' in ml and 'instruct' not in ml,
+    sort_key=_standard_sort_key
+)
+
+OPENAI_COMPATIBLE = ProviderSpec(
+    models_url=_versioned_models_url,
+    is_chat_model=lambda ml: any(x in ml for x in CHAT_MODEL_MARKERS),
+    sort_key=_standard_sort_key
+)
+
+PROVIDERS = {
+    'openrouter.ai': OPENROUTER,
+    'api.openai.com': OPENAI,
+}
+
+
+def provider_for(base_url):
+    """Get the ProviderSpec for a base URL"""
+    host = urlparse(base_url).hostname or ''
+    return PROVIDERS.get(host, OPENAI_COMPATIBLE)
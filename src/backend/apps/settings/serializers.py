@@ -1,9 +1,22 @@
 from rest_framework import serializers
+from apps.common.serializers import CachedModelSerializer
 from .models import UserSettings
 
 
-class UserSettingsSerializer(serializers.ModelSerializer):
+class MaskedAPIKeyField(serializers.CharField):
+    """API key field that only reads back the last 4 characters"""
+
+    def to_representation(self, value):
+        # Mask API key for security (show only last 4 characters)
+        value = super().to_representation(value)
+        if len(value) > 4:
+            return '****' + value[-4:]
+        return value
+
+
+class UserSettingsSerializer(CachedModelSerializer):
     """Serializer for user settings"""
+    api_key = MaskedAPIKeyField(max_length=500, required=False, allow_blank=True, allow_null=True)
 
     class Meta:
         model = UserSettings
@@ -26,18 +39,6 @@ class UserSettingsSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['id', 'created_at', 'updated_at']
 
-    def to_representation(self, instance):
-        """Customize the output representation"""
-        data = super().to_representation(instance)
-        
-        # Mask API key for security (show only last 4 characters)
-        if data.get('api_key'):
-            api_key = data['api_key']
-            if len(api_key) > 4:
-                data['api_key'] = '****' + api_key[-4:]
-        
-        return data
-
 
 class SettingsUpdateSerializer(serializers.Serializer):
     """Serializer for updating settings"""
@@ -0,0 +1,14 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import UserSettings
+from .cache import invalidate_cached_settings
+
+
+@receiver([post_save, post_delete], sender=UserSettings)
+def invalidate_settings_cache(sender, instance, **kwargs):
+    """Keep the in-process settings cache in sync with the DB"""
+    # After commit, so a read while the update's transaction is open can't
+    # cache the old row again
+    user_id = instance.user_id
+    transaction.on_commit(lambda: invalidate_cached_settings(user_id))
@@ -1,3 +1,318 @@
-from django.test import TestCase
+import asyncio
+from unittest import mock
+from django.core.cache import cache
+from django.db import transaction
+from django.test import SimpleTestCase, TestCase
+from rest_framework.test import APIClient
+from . import views
+from .breaker import CircuitBreaker
+from .cache import PageSettings, get_user_settings
+from .models import UserSettings
+from .throttle import TokenBucket, aallow_request
+from .views import MULTIGET_MAX_USERS, _available_models_cache_key
 
-# Create your tests here.
+
+SETTINGS_URL = '/api/settings/'
+
+
+MULTIGET_URL = '/api/settings/multiget/'
+
+
+class Clock:
+    """Stands in for time.monotonic / time.time"""
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class CircuitBreakerTests(SimpleTestCase):
+    def setUp(self):
+        self.clock = Clock()
+        patcher = mock.patch('apps.settings.breaker.time.monotonic', self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.breaker = CircuitBreaker('test', failure_threshold=3, reset_timeout=60)
+
+    def _trip(self, key='a'):
+        for _ in range(3):
+            self.breaker.record_failure(key)
+
+    def test_opens_after_threshold(self):
+        for _ in range(2):
+            self.breaker.record_failure('a')
+        self.assertTrue(self.breaker.allow('a'))
+        self.breaker.record_failure('a')
+        self.assertFalse(self.breaker.allow('a'))
+        # Circuits are per key
+        self.assertTrue(self.breaker.allow('b'))
+
+    def test_success_resets_the_failure_count(self):
+        for _ in range(2):
+            self.breaker.record_failure('a')
+        self.breaker.record_success('a')
+        for _ in range(2):
+            self.breaker.record_failure('a')
+        self.assertTrue(self.breaker.allow('a'))
+
+    def test_half_open_lets_one_probe_through(self):
+        self._trip()
+        self.clock.now += 60
+        self.assertTrue(self.breaker.allow('a'))
+        self.assertFalse(self.breaker.allow('a'))
+
+    def test_successful_probe_closes(self):
+        self._trip()
+        self.clock.now += 60
+        self.breaker.allow('a')
+        self.breaker.record_success('a')
+        self.assertTrue(self.breaker.allow('a'))
+        self.assertTrue(self.breaker.allow('a'))
+
+    def test_failed_probe_reopens(self):
+        self._trip()
+        self.clock.now += 60
+        self.breaker.allow('a')
+        self.breaker.record_failure('a')
+        self.assertFalse(self.breaker.allow('a'))
+        self.clock.now += 60
+        self.assertTrue(self.breaker.allow('a'))
+
+    def test_stale_probe_is_replaced(self):
+        self._trip()
+        self.clock.now += 60
+        self.breaker.allow('a')
+        # The probe never reports back
+        self.clock.now += 60
+        self.assertTrue(self.breaker.allow('a'))
+
+
+class TokenBucketTests(SimpleTestCase):
+    def setUp(self):
+        self.clock = Clock()
+        patcher = mock.patch('apps.settings.throttle.time.monotonic', self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_burst_then_refill(self):
+        bucket = TokenBucket(rate=2, burst=3)
+        self.assertEqual([bucket.take('a') for _ in range(4)], [True, True, True, False])
+        self.clock.now += 0.5
+        self.assertEqual([bucket.take('a') for _ in range(2)], [True, False])
+
+    def test_refill_is_capped_at_burst(self):
+        bucket = TokenBucket(rate=2, burst=3)
+        bucket.take('a')
+        self.clock.now += 3600
+        self.assertEqual([bucket.take('a') for _ in range(4)], [True, True, True, False])
+
+    def test_keys_have_separate_buckets(self):
+        bucket = TokenBucket(rate=1, burst=1)
+        self.assertTrue(bucket.take('a'))
+        self.assertFalse(bucket.take('a'))
+        self.assertTrue(bucket.take('b'))
+
+
+class AllowRequestTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.clock = Clock(now=6000.0)
+        patcher = mock.patch('apps.settings.throttle.time.time', self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def test_limit_per_window(self):
+        results = [await aallow_request('client', 2, 60) for _ in range(3)]
+        self.assertEqual(results, [True, True, False])
+        self.assertTrue(await aallow_request('other', 2, 60))
+
+    async def test_new_window_resets_the_count(self):
+        for _ in range(3):
+            await aallow_request('client', 2, 60)
+        self.clock.now += 60
+        self.assertTrue(await aallow_request('client', 2, 60))
+
+
+class SettingsReadLimitTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def _get(self, user_id):
+        # Every request comes through the same proxy
+        return self.client.get(SETTINGS_URL, {'user_id': user_id}, REMOTE_ADDR='10.0.0.1')
+
+    def test_limit_is_per_user(self):
+        with mock.patch('apps.settings.views.SETTINGS_READ_LIMIT', 2):
+            statuses = [self._get('alice').status_code for _ in range(3)]
+            self.assertEqual(statuses, [200, 200, 429])
+            self.assertEqual(self._get('bob').status_code, 200)
+
+
+class MultigetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        UserSettings.objects.create(
+            user_id='alice', api_key='key', base_url='https://llm.example/v1', model='gpt-4o',
+            rag_config={'embedding': {'model': 'embed-small'}}
+        )
+        UserSettings.objects.create(user_id='bob', model='gpt-3.5-turbo')
+
+    def test_settings_for_each_user(self):
+        cache.set(_available_models_cache_key('https://llm.example/v1', 'key'), ['gpt-4o', 'gpt-4'])
+        with self.assertNumQueries(1):
+            response = self.client.post(MULTIGET_URL, {'user_ids': ['alice', 'bob', 'carol']}, format='json')
+        self.assertEqual(response.status_code, 200)
+        items = response.json()['items']
+        self.assertEqual(list(items), ['alice', 'bob', 'carol'])
+
+        self.assertEqual(items['alice']['openai'], {
+            'isConfigured': True,
+            'baseUrl': 'https://llm.example/v1',
+            'model': 'gpt-4o',
+            'availableModels': ['gpt-4o', 'gpt-4']
+        })
+        self.assertEqual(items['alice']['rag']['embedding']['model'], 'embed-small')
+        self.assertFalse(items['bob']['openai']['isConfigured'])
+        self.assertEqual(items['bob']['openai']['model'], 'gpt-3.5-turbo')
+        # Users without settings get the defaults
+        self.assertEqual(items['carol']['openai']['model'], 'gpt-4')
+        self.assertEqual(items['carol']['openai']['availableModels'], [])
+
+    def test_model_lists_come_from_the_cache_only(self):
+        with mock.patch('apps.settings.views._afetch_available_models') as fetch:
+            response = self.client.post(MULTIGET_URL, {'user_ids': ['alice']}, format='json')
+        fetch.assert_not_called()
+        self.assertEqual(response.json()['items']['alice']['openai']['availableModels'], [])
+
+    def test_user_id_cap(self):
+        user_ids = [f'user-{i}' for i in range(MULTIGET_MAX_USERS)]
+        response = self.client.post(MULTIGET_URL, {'user_ids': user_ids}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['items']), MULTIGET_MAX_USERS)
+
+        response = self.client.post(MULTIGET_URL, {'user_ids': user_ids + ['one-more']}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_rejects_invalid_user_ids(self):
+        for body in ({}, {'user_ids': 'alice'}, {'user_ids': ['alice', 1]}):
+            with self.subTest(body=body):
+                response = self.client.post(MULTIGET_URL, body, format='json')
+                self.assertEqual(response.status_code, 400)
+
+
+class SettingsUpdateTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.settings = UserSettings.objects.create(
+            user_id='alice', api_key='key', base_url='https://llm.example/v1',
+            rag_config={'embedding': {'model': 'embed-small', 'endpoint': 'http://embed'}, 'extra': 1}
+        )
+
+    def _put(self, **body):
+        return self.client.put(SETTINGS_URL, {'user_id': 'alice', **body}, format='json')
+
+    def test_openai_fields(self):
+        response = self._put(openai={'apiKey': 'new-key', 'model': 'gpt-4o'})
+        self.assertEqual(response.status_code, 200)
+        self.settings.refresh_from_db()
+        self.assertEqual(
+            (self.settings.api_key, self.settings.base_url, self.settings.model),
+            ('new-key', 'https://llm.example/v1', 'gpt-4o')
+        )
+
+    def test_rag_sections_are_merged(self):
+        self._put(rag={'embedding': {'model': 'embed-large'}, 'reranking': {'forceLocal': True}})
+        self.settings.refresh_from_db()
+        self.assertEqual(self.settings.rag_config, {
+            'embedding': {'model': 'embed-large', 'endpoint': 'http://embed'},
+            'reranking': {'forceLocal': True},
+            'extra': 1
+        })
+
+    def test_unchanged_values_are_not_saved(self):
+        updated_at = self.settings.updated_at
+        self._put(openai={'apiKey': 'key', 'baseUrl': 'https://llm.example/v1'}, rag={'embedding': {'model': 'embed-small'}})
+        self.settings.refresh_from_db()
+        self.assertEqual(self.settings.updated_at, updated_at)
+
+    def test_new_user(self):
+        self._put(user_id='bob', openai={'model': 'gpt-4o'})
+        self.assertEqual(UserSettings.objects.get(user_id='bob').model, 'gpt-4o')
+
+    def test_saving_the_connection_drops_the_cached_model_list(self):
+        key = _available_models_cache_key('https://llm.example/v1', 'key')
+        cache.set(key, ['gpt-4'])
+        self._put(openai={'apiKey': 'key'})
+        self.assertIsNone(cache.get(key))
+
+
+class SettingsCacheInvalidationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_cached_settings_are_dropped_after_commit(self):
+        settings = UserSettings.objects.create(user_id='carol', api_key='old')
+        self.assertEqual(get_user_settings('carol').api_key, 'old')
+
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with transaction.atomic():
+                settings.api_key = 'new'
+                settings.save()
+                # Readers keep the committed row until the update commits
+                self.assertEqual(get_user_settings('carol').api_key, 'old')
+
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(get_user_settings('carol').api_key, 'new')
+
+
+class SettingsResetTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_resets_in_place(self):
+        settings = UserSettings.objects.create(
+            user_id='alice', api_key='key', base_url='https://llm.example/v1', model='gpt-4o',
+            temperature=0.2, theme='dark', rag_enabled=True, rag_config={'embedding': {'model': 'embed-small'}}
+        )
+        response = self.client.post('/api/settings/reset/', {'user_id': 'alice'}, format='json')
+        self.assertEqual(response.status_code, 200)
+
+        reset = UserSettings.objects.get(user_id='alice')
+        self.assertEqual(reset.id, settings.id)
+        self.assertEqual(
+            (reset.api_key, reset.base_url, reset.model, reset.temperature, reset.theme, reset.rag_enabled, reset.rag_config),
+            (None, None, 'gpt-4', 0.7, 'light', False, {})
+        )
+
+    def test_new_user_gets_defaults(self):
+        response = self.client.post('/api/settings/reset/', {'user_id': 'bob'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['model'], 'gpt-4')
+        self.assertEqual(UserSettings.objects.filter(user_id='bob').count(), 1)
+
+
+class AvailableModelsTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        views._models_local.clear()
+
+    async def test_concurrent_misses_share_one_fetch(self):
+        calls = []
+
+        async def fetch(base_url, api_key):
+            calls.append(base_url)
+            await asyncio.sleep(0.05)
+            return ['gpt-4o']
+
+        settings = PageSettings('key', 'https://llm.example/v1', 'gpt-4', {})
+        with mock.patch('apps.settings.views._afetch_available_models', fetch):
+            results = await asyncio.gather(*(views._aget_available_models(settings) for _ in range(10)))
+
+        self.assertEqual(calls, ['https://llm.example/v1'])
+        self.assertEqual(results, [['gpt-4o']] * 10)
+        self.assertEqual(views._models_inflight, {})
+        self.assertEqual(await cache.aget(_available_models_cache_key('https://llm.example/v1', 'key')), ['gpt-4o'])
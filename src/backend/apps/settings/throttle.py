@@ -0,0 +1,43 @@
+"""
+Rate limits for the settings endpoints and their upstream calls
+"""
+import threading
+import time
+from django.core.cache import cache
+
+
+class TokenBucket:
+    """
+    In-process token bucket per key: `rate` tokens per second, up to `burst`
+    """
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        # key -> (tokens, last refill)
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def take(self, key):
+        """Take a token for key; False if none are left"""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+            allowed = tokens >= 1
+            self._buckets[key] = (tokens - 1 if allowed else tokens, now)
+        return allowed
+
+
+async def aallow_request(key, limit, window):
+    """
+    Count a request against key in a fixed window of `window` seconds,
+    shared by all workers through the cache. False once over `limit`.
+    """
+    cache_key = f"ratelimit:{key}:{int(time.time() // window)}"
+    if await cache.aadd(cache_key, 1, window):
+        return True
+    try:
+        return await cache.aincr(cache_key) <= limit
+    except ValueError:
+        # The window expired between add and incr
+        return True
@@ -1,12 +1,12 @@
 from django.urls import path
-from .views import SettingsViewSet
+from .views import SettingsViewSet, settings_root
 
 urlpatterns = [
-    path('', SettingsViewSet.as_view({
-        'get': 'list',
-        'put': 'bulk_update'
-    }), name='settings'),
+    path('', settings_root, name='settings'),
     path('reset/', SettingsViewSet.as_view({
         'post': 'reset'
     }), name='settings-reset'),
+    path('multiget/', SettingsViewSet.as_view({
+        'post': 'multiget'
+    }), name='settings-multiget'),
 ]
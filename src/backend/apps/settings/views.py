@@ -6,174 +6,105 @@ from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
 from .models import UserSettings
 from .serializers import UserSettingsSerializer, SettingsUpdateSerializer
-import os
-import requests
+from .breaker import CircuitBreaker
+from .throttle import TokenBucket, aallow_request
+from .providers import provider_for
+from .cache import aget_page_settings, PageSettings, PAGE_SETTINGS_FIELDS
+from apps.common.responses import ORJSONResponse
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse
+from asgiref.sync import sync_to_async
+from cachetools import TTLCache
+from apps.chat.llm import llm_client, OPENAI_API_BASE
+import asyncio
+import hashlib
+import threading
+import httpx
+import orjson
 import logging
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_SETTINGS = {
+    'model': 'gpt-4',
+    'temperature': 0.7,
+    'max_tokens': 2048,
+    'top_p': 1.0,
+    'rag_enabled': False,
+    'theme': 'light',
+    'language': 'en'
+}
+
+# Fields without a value in DEFAULT_SETTINGS that reset also clears
+RESET_SETTINGS = {
+    'api_key': None,
+    'base_url': None,
+    'rag_config': {},
+    'metadata': {}
+}
+
+MULTIGET_MAX_USERS = 100
+
+# Request keys accepted by PUT /api/settings and where they are stored
+OPENAI_SETTINGS_FIELDS = (('apiKey', 'api_key'), ('baseUrl', 'base_url'), ('model', 'model'))
+RAG_SETTINGS_KEYS = (
+    ('embedding', ('model', 'endpoint')),
+    ('reranking', ('endpoint', 'apiKey', 'forceLocal')),
+)
+
+# Model lists change rarely; failures are cached briefly so an upstream
+# outage isn't hit again on every settings poll
+AVAILABLE_MODELS_TTL = 600
+AVAILABLE_MODELS_FAILURE_TTL = 30
+# Last successful list, served while the provider is failing
+LAST_GOOD_MODELS_TTL = 86400
+
+# Process-local copy in front of the shared cache; a short TTL bounds how
+# long other workers keep a list after it is refetched
+AVAILABLE_MODELS_LOCAL_TTL = 60
+_models_local = TTLCache(maxsize=128, ttl=AVAILABLE_MODELS_LOCAL_TTL)
+_models_local_lock = threading.Lock()
+
+# Model list fetches in progress, so concurrent misses for the same key
+# share one upstream request (key -> asyncio.Task)
+_models_inflight = {}
+
+# Skips the models request for a base URL whose provider keeps timing out,
+# refusing connections or returning 5xx
+models_breaker = CircuitBreaker('models', failure_threshold=5, reset_timeout=60)
+# Bounds the models requests sent to each provider; over it the cached
+# list is served instead
+models_bucket = TokenBucket(rate=4, burst=8)
+
+# The models request goes through the shared keep-alive client; transient
+# upstream errors are retried before they count against the breaker
+MODELS_FETCH_RETRIES = 2
+MODELS_FETCH_BACKOFF = 0.3
+RETRY_STATUSES = frozenset((502, 503, 504))
+
+# Per-user limit on GET /api/settings
+SETTINGS_READ_LIMIT = 30
+SETTINGS_READ_WINDOW = 60
+
+
+def _effective_base_url(settings):
+    return settings.base_url or OPENAI_API_BASE
+
+
+def _available_models_cache_key(base_url, api_key):
+    digest = hashlib.sha256(f"{base_url}|{api_key}".encode()).hexdigest()
+    return f"settings:models:{digest}"
+
 
 @method_decorator(csrf_exempt, name='dispatch')
 class SettingsViewSet(viewsets.ViewSet):
     """
     ViewSet for managing user settings
-    Provides GET and PUT endpoints for settings management
+    Provides the PUT and reset endpoints; GET is the async settings_list
     """
     permission_classes = [AllowAny]
 
-    def list(self, request):
-        """
-        GET /api/settings
-        Get current user settings in the format expected by frontend
-        """
-        # For now, use a default user_id. In production, this would come from authentication
-        user_id = request.query_params.get('user_id', 'default_user')
-
-        # Get or create settings for the user
-        settings, created = UserSettings.objects.get_or_create(
-            user_id=user_id,
-            defaults={
-                'model': 'gpt-4',
-                'temperature': 0.7,
-                'max_tokens': 2048,
-                'top_p': 1.0,
-                'rag_enabled': False,
-                'theme': 'light',
-                'language': 'en'
-            }
-        )
-
-        # Get RAG configuration from settings
-        rag_config = settings.rag_config or {}
-
-        # Format response to match frontend expectations
-        response_data = {
-            'openai': {
-                'isConfigured': bool(settings.api_key),
-                'baseUrl': settings.base_url or os.getenv('OPENAI_API_BASE', 'https://api.openai.com/v1'),
-                'model': settings.model or 'gpt-4',
-                'availableModels': self._get_available_models(settings)
-            },
-            'rag': {
-                'embedding': {
-                    'model': rag_config.get('embedding', {}).get('model', ''),
-                    'endpoint': rag_config.get('embedding', {}).get('endpoint', ''),
-                    'isConfigured': bool(rag_config.get('embedding', {}).get('model') or rag_config.get('embedding', {}).get('endpoint'))
-                },
-                'reranking': {
-                    'endpoint': rag_config.get('reranking', {}).get('endpoint', ''),
-                    'hasApiKey': bool(rag_config.get('reranking', {}).get('apiKey')),
-                    'forceLocal': rag_config.get('reranking', {}).get('forceLocal', ''),
-                    'isConfigured': bool(rag_config.get('reranking', {}).get('endpoint'))
-                }
-            }
-        }
-
-        return Response(response_data, status=status.HTTP_200_OK)
-
-    def _get_available_models(self, settings):
-        """Get list of available models from API - returns empty list if unable to fetch"""
-
-        # Only try to fetch if we have API key
-        if not settings.api_key:
-            logger.info("No API key configured, returning empty model list")
-            return []
-
-        try:
-            base_url = settings.base_url or os.getenv('OPENAI_API_BASE', 'https://api.openai.com/v1')
-
-            # Normalize base URL - remove trailing slash
-            base_url = base_url.rstrip('/')
-
-            # OpenRouter uses a different endpoint structure
-            is_openrouter = 'openrouter.ai' in base_url.lower()
-
-            if is_openrouter:
-                # OpenRouter's models endpoint
-                models_url = "https://openrouter.ai/api/v1/models"
-            else:
-                # Standard OpenAI-compatible endpoint
-                if not base_url.endswith('/v1'):
-                    base_url = f"{base_url}/v1"
-                models_url = f"{base_url}/models"
-
-            # Fetch models from API
-            headers = {
-                'Authorization': f'Bearer {settings.api_key}',
-                'Content-Type': 'application/json'
-            }
-
-            # OpenRouter requires additional headers
-            if is_openrouter:
-                headers['HTTP-Referer'] = os.getenv('OPENROUTER_REFERER', 'http://localhost:20001')
-                headers['X-Title'] = os.getenv('OPENROUTER_APP_NAME', 'Mini Chatbox')
-
-            response = requests.get(
-                models_url,
-                headers=headers,
-                timeout=10
-            )
-
-            if response.status_code == 200:
-                data = response.json()
-                if 'data' in data:
-                    # Extract model IDs
-                    models = []
-                    for model in data['data']:
-                        if isinstance(model, dict):
-                            model_id = model.get('id', '')
-                        else:
-                            model_id = str(model)
-
-                        if model_id:
-                            models.append(model_id)
-
-                    # For OpenRouter, filter and sort by popularity
-                    if is_openrouter:
-                        # Filter out non-chat models
-                        filtered_models = [m for m in models if not any(x in m.lower() for x in ['embed', 'whisper', 'tts', 'dall-e'])]
-
-                        # Sort by priority/popularity
-                        def openrouter_sort_key(model_id):
-                            priorities = ['claude-3', 'gpt-4', 'gpt-3.5', 'mixtral', 'llama']
-                            for idx, priority in enumerate(priorities):
-                                if priority in model_id.lower():
-                                    return (idx, model_id)
-                            return (len(priorities), model_id)
-
-                        models = sorted(filtered_models, key=openrouter_sort_key) if filtered_models else []
-
-                    else:
-                        # For OpenAI and other providers
-                        # Filter chat models
-                        if 'api.openai.com' in base_url:
-                            filtered_models = [m for m in models if 'gpt' in m.lower() and 'instruct' not in m.lower()]
-                        else:
-                            filtered_models = [m for m in models if any(x in m.lower() for x in ['gpt', 'claude', 'llama', 'mistral', 'gemini', 'deepseek', 'chat'])]
-
-                        # Sort by priority
-                        def standard_sort_key(model_id):
-                            priorities = ['gpt-4o', 'gpt-4-turbo', 'gpt-4', 'gpt-3.5-turbo', 'claude-3', 'llama']
-                            for idx, priority in enumerate(priorities):
-                                if model_id.startswith(priority):
-                                    return (idx, model_id)
-                            return (len(priorities), model_id)
-
-                        models = sorted(filtered_models, key=standard_sort_key) if filtered_models else sorted(models)
-
-                    logger.info(f"Successfully fetched {len(models)} models from API")
-                    return models
-            else:
-                logger.warning(f"Failed to fetch models from API: {response.status_code}")
-                return []
-
-        except requests.exceptions.Timeout:
-            logger.warning("Timeout while fetching models from API")
-            return []
-        except Exception as e:
-            logger.error(f"Error fetching models from API: {str(e)}")
-            return []
-
     def update(self, request, pk=None):
         """
         PUT /api/settings/{id} or PUT /api/settings/
@@ -181,47 +112,49 @@ class SettingsViewSet(viewsets.ViewSet):
         """
         user_id = request.data.get('user_id', 'default_user')
 
-        # Get or create settings
-        settings, created = UserSettings.objects.get_or_create(user_id=user_id)
-
-        # Handle OpenAI configuration
-        if 'openai' in request.data:
-            openai_config = request.data['openai']
-            if 'apiKey' in openai_config:
-                settings.api_key = openai_config['apiKey']
-            if 'baseUrl' in openai_config:
-                settings.base_url = openai_config['baseUrl']
-            if 'model' in openai_config:
-                settings.model = openai_config['model']
-
-        # Handle RAG configuration
-        if 'rag' in request.data:
-            rag_data = request.data['rag']
-            rag_config = settings.rag_config or {}
-
-            # Update embedding config
-            if 'embedding' in rag_data:
-                if 'embedding' not in rag_config:
-                    rag_config['embedding'] = {}
-                if 'model' in rag_data['embedding']:
-                    rag_config['embedding']['model'] = rag_data['embedding']['model']
-                if 'endpoint' in rag_data['embedding']:
-                    rag_config['embedding']['endpoint'] = rag_data['embedding']['endpoint']
-
-            # Update reranking config
-            if 'reranking' in rag_data:
-                if 'reranking' not in rag_config:
-                    rag_config['reranking'] = {}
-                if 'endpoint' in rag_data['reranking']:
-                    rag_config['reranking']['endpoint'] = rag_data['reranking']['endpoint']
-                if 'apiKey' in rag_data['reranking']:
-                    rag_config['reranking']['apiKey'] = rag_data['reranking']['apiKey']
-                if 'forceLocal' in rag_data['reranking']:
-                    rag_config['reranking']['forceLocal'] = rag_data['reranking']['forceLocal']
-
-            settings.rag_config = rag_config
-
-        settings.save()
+        with transaction.atomic():
+            # Get or create settings; locked so concurrent PUTs don't drop
+            # each other's rag_config changes
+            settings, created = UserSettings.objects.select_for_update().get_or_create(user_id=user_id)
+            dirty = set()
+
+            # Handle OpenAI configuration
+            if 'openai' in request.data:
+                openai_config = request.data['openai']
+                for key, field in OPENAI_SETTINGS_FIELDS:
+                    if key in openai_config and getattr(settings, field) != openai_config[key]:
+                        setattr(settings, field, openai_config[key])
+                        dirty.add(field)
+
+            # Handle RAG configuration
+            if 'rag' in request.data:
+                rag_data = request.data['rag']
+                current = settings.rag_config or {}
+                rag_config = dict(current)
+
+                # Update embedding and reranking config
+                for section, keys in RAG_SETTINGS_KEYS:
+                    if section in rag_data:
+                        values = dict(rag_config.get(section) or {})
+                        for key in keys:
+                            if key in rag_data[section]:
+                                values[key] = rag_data[section][key]
+                        rag_config[section] = values
+
+                # The JSON column is only rewritten when something changed
+                if rag_config != current or settings.rag_config is None:
+                    settings.rag_config = rag_config
+                    dirty.add('rag_config')
+
+            if dirty:
+                settings.save(update_fields=[*dirty, 'updated_at'])
+
+        if 'openai' in request.data and settings.api_key:
+            # Saving the connection again should refetch the model list
+            key = _available_models_cache_key(_effective_base_url(settings), settings.api_key)
+            cache.delete(key)
+            with _models_local_lock:
+                _models_local.pop(key, None)
 
         return Response({
             'success': True,
@@ -244,20 +177,239 @@ class SettingsViewSet(viewsets.ViewSet):
         """
         user_id = request.data.get('user_id', 'default_user')
 
-        # Delete existing settings
-        UserSettings.objects.filter(user_id=user_id).delete()
-
-        # Create new default settings
-        settings = UserSettings.objects.create(
+        # Overwrite every field with its default in place (one locked
+        # UPDATE, or an INSERT for a new user) instead of DELETE + INSERT
+        settings, created = UserSettings.objects.update_or_create(
             user_id=user_id,
-            model='gpt-4',
-            temperature=0.7,
-            max_tokens=2048,
-            top_p=1.0,
-            rag_enabled=False,
-            theme='light',
-            language='en'
+            defaults={**DEFAULT_SETTINGS, **RESET_SETTINGS}
         )
 
         serializer = UserSettingsSerializer(settings)
         return Response(serializer.data, status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=['post'])
+    def multiget(self, request):
+        """
+        POST /api/settings/multiget {"user_ids": [...]}
+        Get several users' settings in one request and one query
+        Model lists come from the cache only; users without settings get the defaults.
+        """
+        user_ids = request.data.get('user_ids')
+        if not isinstance(user_ids, list) or not all(isinstance(user_id, str) for user_id in user_ids):
+            return Response({'error': 'user_ids must be a list of strings'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(user_ids) > MULTIGET_MAX_USERS:
+            return Response({'error': f'At most {MULTIGET_MAX_USERS} user_ids per request'}, status=status.HTTP_400_BAD_REQUEST)
+
+        rows = UserSettings.objects.filter(user_id__in=user_ids).only('user_id', *PAGE_SETTINGS_FIELDS)
+        found = {
+            row.user_id: PageSettings(*(getattr(row, field) for field in PAGE_SETTINGS_FIELDS))
+            for row in rows
+        }
+        default = PageSettings(None, None, DEFAULT_SETTINGS['model'], {})
+        settings_by_user = {user_id: found.get(user_id, default) for user_id in user_ids}
+
+        model_keys = {
+            user_id: _available_models_cache_key(_effective_base_url(settings), settings.api_key)
+            for user_id, settings in settings_by_user.items()
+            if settings.api_key
+        }
+        cached_models = cache.get_many(set(model_keys.values()))
+
+        items = {
+            user_id: _settings_payload(settings, cached_models.get(model_keys.get(user_id), []))
+            for user_id, settings in settings_by_user.items()
+        }
+        return ORJSONResponse({'items': items}, status=status.HTTP_200_OK)
+
+
+_settings_update_view = SettingsViewSet.as_view({'put': 'bulk_update'})
+
+
+@csrf_exempt
+async def settings_root(request):
+    """
+    /api/settings
+    GET is served here asynchronously so the model list fetch doesn't tie
+    up a worker thread; PUT goes to the sync SettingsViewSet
+    """
+    if request.method == 'GET':
+        return await settings_list(request)
+    return await sync_to_async(_settings_update_view)(request)
+
+
+async def settings_list(request):
+    """
+    GET /api/settings
+    Get current user settings in the format expected by frontend
+    """
+    # For now, use a default user_id. In production, this would come from authentication
+    user_id = request.GET.get('user_id', 'default_user')
+
+    # Keyed by user: behind the proxy every request has its REMOTE_ADDR
+    if not await aallow_request(f"settings:{user_id}", SETTINGS_READ_LIMIT, SETTINGS_READ_WINDOW):
+        return HttpResponse(orjson.dumps({'error': 'Too many requests'}), status=429, content_type='application/json')
+
+    # Get or create settings for the user; only the fields shown are read
+    settings = await aget_page_settings(user_id, DEFAULT_SETTINGS)
+
+    response_data = _settings_payload(settings, await _aget_available_models(settings))
+    return HttpResponse(orjson.dumps(response_data), content_type='application/json')
+
+
+def _settings_payload(settings, available_models):
+    """Build the settings response in the format expected by frontend"""
+    # Get RAG configuration from settings
+    rag_config = settings.rag_config or {}
+    embedding = rag_config.get('embedding') or {}
+    reranking = rag_config.get('reranking') or {}
+    embedding_model = embedding.get('model', '')
+    embedding_endpoint = embedding.get('endpoint', '')
+    reranking_endpoint = reranking.get('endpoint', '')
+
+    # Format response to match frontend expectations
+    return {
+        'openai': {
+            'isConfigured': bool(settings.api_key),
+            'baseUrl': _effective_base_url(settings),
+            'model': settings.model or 'gpt-4',
+            'availableModels': available_models
+        },
+        'rag': {
+            'embedding': {
+                'model': embedding_model,
+                'endpoint': embedding_endpoint,
+                'isConfigured': bool(embedding_model or embedding_endpoint)
+            },
+            'reranking': {
+                'endpoint': reranking_endpoint,
+                'hasApiKey': bool(reranking.get('apiKey')),
+                'forceLocal': reranking.get('forceLocal', ''),
+                'isConfigured': bool(reranking_endpoint)
+            }
+        }
+    }
+
+
+async def _aget_available_models(settings):
+    """Get list of available models from API - returns empty list if unable to fetch"""
+
+    # Only try to fetch if we have API key
+    if not settings.api_key:
+        logger.info("No API key configured, returning empty model list")
+        return []
+
+    base_url = _effective_base_url(settings)
+    key = _available_models_cache_key(base_url, settings.api_key)
+    with _models_local_lock:
+        models = _models_local.get(key)
+    if models is not None:
+        return models
+
+    models = await cache.aget(key)
+    if models is not None:
+        _remember_models(key, models)
+        return models
+
+    # Join a fetch already running for this key on this event loop
+    task = _models_inflight.get(key)
+    if task is None or task.get_loop() is not asyncio.get_running_loop():
+        task = asyncio.create_task(_arefresh_available_models(key, base_url, settings.api_key), name=key)
+        _models_inflight[key] = task
+        task.add_done_callback(_forget_inflight)
+    # Shielded so one caller disconnecting doesn't cancel the others' fetch
+    return await asyncio.shield(task)
+
+
+async def _arefresh_available_models(key, base_url, api_key):
+    """Fetch and cache the model list, falling back to the last good one"""
+    last_good_key = f"{key}:last"
+    if models_bucket.take(base_url) and models_breaker.allow(base_url):
+        models = await _afetch_available_models(base_url, api_key)
+    else:
+        models = None
+
+    if models is None:
+        models = await cache.aget(last_good_key, [])
+        await cache.aset(key, models, AVAILABLE_MODELS_FAILURE_TTL)
+        return models
+    await cache.aset(key, models, AVAILABLE_MODELS_TTL)
+    await cache.aset(last_good_key, models, LAST_GOOD_MODELS_TTL)
+    _remember_models(key, models)
+    return models
+
+
+def _forget_inflight(task):
+    # Keyed by task name; a newer fetch on another loop may have replaced it
+    if _models_inflight.get(task.get_name()) is task:
+        del _models_inflight[task.get_name()]
+
+
+def _remember_models(key, models):
+    with _models_local_lock:
+        _models_local[key] = tuple(models)
+
+
+async def _aget_with_retries(url, headers):
+    """
+    GET on the pooled client, retrying connect errors and 502/503/504
+    with exponential backoff
+    """
+    for attempt in range(MODELS_FETCH_RETRIES + 1):
+        last_attempt = attempt == MODELS_FETCH_RETRIES
+        try:
+            response = await llm_client.get(url, headers=headers, timeout=10)
+        except httpx.ConnectError:
+            if last_attempt:
+                raise
+        else:
+            if last_attempt or response.status_code not in RETRY_STATUSES:
+                return response
+        await asyncio.sleep(MODELS_FETCH_BACKOFF * 2 ** attempt)
+
+
+async def _afetch_available_models(base_url, api_key):
+    """Fetch the chat model ids from the API; returns None if unable to fetch"""
+    try:
+        spec = provider_for(base_url)
+        response = await _aget_with_retries(spec.models_url(base_url), spec.headers(api_key))
+
+        # Client errors (e.g. a bad key) still mean the provider is up
+        if response.status_code >= 500:
+            models_breaker.record_failure(base_url)
+        else:
+            models_breaker.record_success(base_url)
+
+        if response.status_code == 200:
+            # The catalog can be several MB (OpenRouter); orjson parses it
+            # much faster than the stdlib decoder behind response.json()
+            data = orjson.loads(response.content)
+            if 'data' in data:
+                # Extract model IDs
+                models = []
+                for model in data['data']:
+                    if isinstance(model, dict):
+                        model_id = model.get('id', '')
+                    else:
+                        model_id = str(model)
+
+                    if model_id:
+                        models.append(model_id)
+
+                models = spec.pick_models(models)
+                logger.info(f"Successfully fetched {len(models)} models from API")
+                return models
+        else:
+            logger.warning(f"Failed to fetch models from API: {response.status_code}")
+            return None
+
+    except httpx.TimeoutException:
+        models_breaker.record_failure(base_url)
+        logger.warning("Timeout while fetching models from API")
+        return None
+    except httpx.TransportError as e:
+        models_breaker.record_failure(base_url)
+        logger.error(f"Error fetching models from API: {str(e)}")
+        return None
+    except Exception as e:
+        logger.error(f"Error fetching models from API: {str(e)}")
+        return None
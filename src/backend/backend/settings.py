@@ -93,6 +93,9 @@ DATABASES = {
     }
 }
 
+# Builds the test database from the models; see apps.common.test_runner
+TEST_RUNNER = 'apps.common.test_runner.ModelSchemaTestRunner'
+
 # Cache (Redis)
 CACHES = {
     'default': {
@@ -100,6 +103,20 @@ CACHES = {
         'LOCATION': env('REDIS_URL', default='redis://localhost:6379/0'),
         'OPTIONS': {
             'CLIENT_CLASS': 'django_redis.client.DefaultClient',
+            'CONNECTION_POOL_KWARGS': {'max_connections': 50},
+        }
+    },
+    # Client-supplied JSON data for the conversation cache endpoints; msgpack
+    # is smaller and faster than pickle for plain data. Kept separate because
+    # the default cache also stores datetimes and namedtuples
+    'conversation': {
+        'BACKEND': 'django_redis.cache.RedisCache',
+        'LOCATION': env('REDIS_URL', default='redis://localhost:6379/0'),
+        'KEY_PREFIX': 'msgpack',
+        'OPTIONS': {
+            'CLIENT_CLASS': 'django_redis.client.DefaultClient',
+            'SERIALIZER': 'django_redis.serializers.msgpack.MSGPackSerializer',
+            'CONNECTION_POOL_KWARGS': {'max_connections': 50},
         }
     }
 }
@@ -158,7 +175,7 @@ REST_FRAMEWORK = {
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 20,
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
+        'apps.common.renderers.ORJSONRenderer',
     ],
 }
 
@@ -183,7 +200,8 @@ SIMPLE_JWT = {
 
 # File Upload Settings
 MAX_UPLOAD_SIZE = env.int('MAX_UPLOAD_SIZE', default=10485760)  # 10MB
-FILE_UPLOAD_MAX_MEMORY_SIZE = MAX_UPLOAD_SIZE
+# Uploads above this are spooled to a temporary file instead of held in memory
+FILE_UPLOAD_MAX_MEMORY_SIZE = env.int('FILE_UPLOAD_MAX_MEMORY_SIZE', default=262144)  # 256KB
 
 # AI API Keys
 OPENAI_API_KEY = env('OPENAI_API_KEY', default='')
@@ -200,6 +218,8 @@ CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE
+# Set where a Celery worker is running; otherwise tasks run in-process
+USE_CELERY_WORKER = env.bool('USE_CELERY_WORKER', default=False)
 
 # Logging
 LOGGING = {
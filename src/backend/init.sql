@@ -120,6 +120,7 @@ CREATE TABLE IF NOT EXISTS messages (
 );
 CREATE INDEX IF NOT EXISTS messages_conversation_id_idx ON messages(conversation_id);
 CREATE INDEX IF NOT EXISTS messages_created_at_idx ON messages(created_at);
+CREATE INDEX IF NOT EXISTS messages_conv_created ON messages(conversation_id, created_at DESC);
 
 -- Conversations
 CREATE TABLE IF NOT EXISTS conversations (
@@ -138,6 +139,11 @@ CREATE TABLE IF NOT EXISTS conversations (
 );
 CREATE INDEX IF NOT EXISTS conversations_session_id_idx ON conversations(session_id);
 CREATE INDEX IF NOT EXISTS conversations_updated_at_idx ON conversations(updated_at);
+CREATE INDEX IF NOT EXISTS conversations_updated_id ON conversations(updated_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS conversations_last_activity ON conversations(last_activity DESC);
+CREATE INDEX IF NOT EXISTS conversations_created_at ON conversations(created_at);
+CREATE INDEX IF NOT EXISTS conversations_archived ON conversations(id) WHERE is_archived;
+CREATE INDEX IF NOT EXISTS conversations_starred ON conversations(id) WHERE is_starred;
 
 -- Projects
 CREATE TABLE IF NOT EXISTS projects (
@@ -203,7 +209,7 @@ CREATE INDEX IF NOT EXISTS user_settings_user_id_idx ON user_settings(user_id);
 -- MCP Servers
 CREATE TABLE IF NOT EXISTS mcp_servers (
     id SERIAL PRIMARY KEY,
-    name VARCHAR(255) NOT NULL,
+    name VARCHAR(255) NOT NULL UNIQUE,
     url VARCHAR(500) NOT NULL,
     api_key VARCHAR(500) NOT NULL DEFAULT '',
     is_active BOOLEAN DEFAULT TRUE,
@@ -224,6 +230,7 @@ CREATE TABLE IF NOT EXISTS mcp_tools (
     FOREIGN KEY (server_id) REFERENCES mcp_servers(id) ON DELETE CASCADE
 );
 CREATE INDEX IF NOT EXISTS mcp_tools_server_id_idx ON mcp_tools(server_id);
+CREATE UNIQUE INDEX IF NOT EXISTS mcp_tools_server_id_name_uniq ON mcp_tools(server_id, name);
 
 -- Grant permissions
 GRANT ALL PRIVILEGES ON ALL TABLES IN SCHEMA public TO chatbox;